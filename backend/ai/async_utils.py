@@ -0,0 +1,89 @@
+import asyncio
+import os
+import threading
+from typing import Any, AsyncIterator, Awaitable, Optional
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_background_loop() -> asyncio.AbstractEventLoop:
+    """
+    Event loop running forever on a daemon thread, shared by the process
+
+    genai's async (grpc.aio) client binds to the first loop it is used on,
+    so every async Gemini call goes through this one loop instead of a fresh
+    asyncio.run() loop per request.
+    """
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = _new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="ai-async-loop", daemon=True)
+                thread.start()
+                _loop = loop
+    return _loop
+
+
+def _new_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    uvloop event loop when installed (not available on Windows), else asyncio's
+
+    Set AI_EVENT_LOOP=asyncio to force the stock loop.
+    """
+    if os.getenv("AI_EVENT_LOOP", "uvloop") != "asyncio":
+        try:
+            import uvloop
+            return uvloop.new_event_loop()
+        except ImportError:
+            pass
+    return asyncio.new_event_loop()
+
+
+def run_sync(coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+    """
+    Run a coroutine on the background loop and block until it finishes
+
+    Must not be called from the background loop itself (it would deadlock).
+    """
+    future = asyncio.run_coroutine_threadsafe(coro, get_background_loop())
+    return future.result(timeout)
+
+
+async def run_async(coro: Awaitable[Any]) -> Any:
+    """
+    Await a coroutine on the background loop from any other event loop
+
+    Lets async endpoints (on uvicorn's loop) make Gemini calls without
+    blocking a thread, while the grpc.aio client stays bound to one loop.
+    """
+    loop = get_background_loop()
+    try:
+        if asyncio.get_running_loop() is loop:
+            return await coro
+    except RuntimeError:
+        pass
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+
+async def iterate_async(agen: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    """
+    Iterate an async generator on the background loop from any other event loop
+
+    Each step runs through run_async, so streamed Gemini responses can be
+    forwarded by async endpoints. The generator is closed on the background
+    loop if the consumer stops early (e.g. the client disconnects).
+    """
+    async def _next():
+        return await agen.__anext__()
+
+    try:
+        while True:
+            try:
+                item = await run_async(_next())
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        await run_async(agen.aclose())
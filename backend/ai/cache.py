@@ -0,0 +1,373 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+
+def hash_key(payload: Any) -> str:
+    """Build a stable sha256 key from a JSON-serializable payload"""
+    canonical = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    def __init__(self, maxsize: int = 256):
+        """Thread-safe in-memory LRU cache built on an OrderedDict"""
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key (marking it recently used) or default"""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._data[key]
+            self.stats["misses"] += 1
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Insert value, evicting the least recently used entry when full"""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class ResponseCache(LRUCache):
+    def __init__(self, path: str = "data/llm_cache.json", maxsize: int = 256):
+        """
+        LRU cache of LLM completions persisted to a JSON file
+
+        Args:
+            path: JSON file used to persist responses across processes
+            maxsize: Maximum number of responses kept (memory and disk)
+        """
+        super().__init__(maxsize=maxsize)
+        self.path = path
+        self._load()
+
+    def _load(self) -> None:
+        """Populate the in-memory layer from disk"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            for key, value in list(entries.items())[-self.maxsize:]:
+                self._data[key] = value
+        except Exception as e:
+            print(f"⚠️ Warning: Failed to load LLM cache from {self.path}: {e}")
+
+    def set(self, key: str, value: str) -> None:
+        """Cache a response and persist the cache to disk"""
+        super().set(key, value)
+        self._persist()
+
+    def _persist(self) -> None:
+        if not self.path:
+            return
+        try:
+            with self._lock:
+                snapshot: Dict[str, Any] = dict(self._data)
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(snapshot, f)
+                os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"⚠️ Warning: Failed to persist LLM cache to {self.path}: {e}")
+
+    @staticmethod
+    def key_for(model: str, prompt: str, temperature: float, extra: Optional[Dict[str, Any]] = None) -> str:
+        """Cache key for a completion request"""
+        payload = {"model": model, "prompt": prompt, "t": temperature}
+        if extra:
+            payload.update(extra)
+        return hash_key(payload)
+
+
+_shared_response_cache: Optional[ResponseCache] = None
+_shared_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide ResponseCache so every generator shares one JSON file"""
+    global _shared_response_cache
+    if _shared_response_cache is None:
+        with _shared_response_cache_lock:
+            if _shared_response_cache is None:
+                _shared_response_cache = ResponseCache(
+                    path=os.getenv("LLM_CACHE_PATH", "data/llm_cache.json")
+                )
+    return _shared_response_cache
+
+
+class DiskLRUCache:
+    def __init__(self, path: str = "data/ai_cache.db", maxsize: int = 5000):
+        """
+        LRU cache of JSON-serializable results persisted in SQLite
+
+        Holds whole validation / scoring results keyed by a hash of their
+        inputs, so repeat requests skip Gemini and the embedding model
+        entirely, across restarts and worker processes.
+
+        Args:
+            path: SQLite database file
+            maxsize: Maximum number of results kept; least recently used
+                entries are evicted first
+        """
+        self.path = path
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the cached result for key (marking it recently used) or default"""
+        try:
+            with self._lock:
+                row = self._conn.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    self.stats["misses"] += 1
+                    return default
+                self._conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+                self.stats["hits"] += 1
+            return json.loads(row[0])
+        except Exception as e:
+            print(f"⚠️ Warning: AI result cache lookup failed: {e}")
+            return default
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a result, evicting the least recently used entries when full"""
+        try:
+            payload = json.dumps(value, default=str)
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO results (key, value, last_used) VALUES (?, ?, ?)",
+                    (key, payload, time.time())
+                )
+                self._conn.execute(
+                    "DELETE FROM results WHERE key IN ("
+                    "SELECT key FROM results ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.maxsize,)
+                )
+        except Exception as e:
+            print(f"⚠️ Warning: Failed to store AI result cache entry: {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+_shared_result_cache: Optional[DiskLRUCache] = None
+_shared_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> Optional[DiskLRUCache]:
+    """Process-wide on-disk cache of whole AI results, or None when ENABLE_AI_CACHE=0"""
+    global _shared_result_cache
+    if os.getenv("ENABLE_AI_CACHE", "1") == "0":
+        return None
+    if _shared_result_cache is None:
+        with _shared_result_cache_lock:
+            if _shared_result_cache is None:
+                try:
+                    _shared_result_cache = DiskLRUCache(
+                        path=os.getenv("AI_CACHE_PATH", "data/ai_cache.db"),
+                        maxsize=int(os.getenv("AI_CACHE_MAXSIZE", "5000"))
+                    )
+                except Exception as e:
+                    print(f"⚠️ Warning: AI result cache unavailable: {e}")
+                    return None
+    return _shared_result_cache
+
+
+class EmbeddingLLMCache:
+    def __init__(
+        self,
+        embed: Optional[Callable[[str], Any]] = None,
+        threshold: float = 0.97,
+        ttl_seconds: float = 24 * 3600,
+        maxsize: int = 1000,
+        collection_name: str = "llm_response_cache",
+    ):
+        """
+        Semantic cache of LLM responses keyed by the text being analyzed
+
+        Lookups try an exact sha256 match first, then the nearest cached
+        entry in an in-memory Chroma collection; a neighbour with cosine
+        similarity >= threshold counts as a hit, so near-duplicate reports
+        reuse an earlier Gemini answer.
+
+        Args:
+            embed: Returns the L2-normalized embedding of a text (defaults to
+                the shared MiniLM model)
+            threshold: Minimum cosine similarity for a semantic hit
+            ttl_seconds: Entries older than this are ignored
+            maxsize: Maximum number of cached responses (LRU eviction)
+            collection_name: Chroma collection holding the cached embeddings
+        """
+        self._embed = embed or _embed_with_shared_model
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+
+        self.collection = None
+        try:
+            import chromadb
+            client = chromadb.EphemeralClient()
+            self.collection = client.get_or_create_collection(
+                name=collection_name,
+                metadata={"hnsw:space": "cosine"}
+            )
+        except Exception as e:
+            print(f"⚠️ Warning: Semantic LLM cache unavailable, using exact matches only: {e}")
+
+    def get(
+        self, namespace: str, text: str, scope: str = "", embedding: Any = None, semantic: bool = True
+    ) -> Any:
+        """
+        Return the cached response for text, or None on a miss
+
+        Args:
+            namespace: Kind of call being cached (e.g. "language_quality")
+            text: Text the LLM was asked about
+            scope: Extra context that must match exactly (e.g. a metrics hash)
+            embedding: Precomputed embedding of text, if the caller has one
+            semantic: False to accept exact matches only (for answers such as
+                validity verdicts that a near-duplicate text can flip)
+        """
+        key = self._key(namespace, text, scope)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.stats["exact_hits"] += 1
+                return entry[0]
+
+        if semantic and self.collection is not None:
+            try:
+                if embedding is None:
+                    embedding = self._embed(text)
+                results = self.collection.query(
+                    query_embeddings=[np.asarray(embedding, dtype=np.float32)],
+                    n_results=1,
+                    where={"$and": [{"namespace": namespace}, {"scope": scope}]},
+                )
+                if results["ids"] and results["ids"][0]:
+                    hit_key = results["ids"][0][0]
+                    similarity = 1.0 - results["distances"][0][0]
+                    with self._lock:
+                        entry = self._entries.get(hit_key)
+                        if (
+                            entry is not None
+                            and similarity >= self.threshold
+                            and now - entry[1] <= self.ttl_seconds
+                        ):
+                            self._entries.move_to_end(hit_key)
+                            self.stats["semantic_hits"] += 1
+                            return entry[0]
+            except Exception as e:
+                print(f"⚠️ Warning: Semantic LLM cache lookup failed: {e}")
+
+        self.stats["misses"] += 1
+        return None
+
+    def set(
+        self, namespace: str, text: str, response: Any, scope: str = "", embedding: Any = None, semantic: bool = True
+    ) -> None:
+        """Store a response under its exact key and, if semantic, its embedding"""
+        key = self._key(namespace, text, scope)
+        now = time.time()
+
+        with self._lock:
+            self._entries[key] = (response, now)
+            self._entries.move_to_end(key)
+            evicted = []
+            while len(self._entries) > self.maxsize:
+                evicted.append(self._entries.popitem(last=False)[0])
+
+        if self.collection is None:
+            return
+        try:
+            if semantic:
+                if embedding is None:
+                    embedding = self._embed(text)
+                self.collection.upsert(
+                    ids=[key],
+                    embeddings=[np.asarray(embedding, dtype=np.float32)],
+                    metadatas=[{"namespace": namespace, "scope": scope, "ts": now}],
+                )
+            if evicted:
+                self.collection.delete(ids=evicted)
+        except Exception as e:
+            print(f"⚠️ Warning: Failed to store semantic LLM cache entry: {e}")
+
+    @staticmethod
+    def _key(namespace: str, text: str, scope: str) -> str:
+        return hash_key({"ns": namespace, "scope": scope, "text": text})
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _embed_with_shared_model(text: str) -> Any:
+    from ai.embeddings import get_embedding_model
+    return get_embedding_model().encode(text, convert_to_numpy=True, normalize_embeddings=True)
+
+
+_shared_llm_cache: Optional[EmbeddingLLMCache] = None
+_shared_llm_cache_lock = threading.Lock()
+
+
+def get_llm_cache() -> Optional[EmbeddingLLMCache]:
+    """Process-wide semantic LLM cache, or None when LLM_SEMANTIC_CACHE=0"""
+    global _shared_llm_cache
+    if os.getenv("LLM_SEMANTIC_CACHE", "1") == "0":
+        return None
+    if _shared_llm_cache is None:
+        with _shared_llm_cache_lock:
+            if _shared_llm_cache is None:
+                _shared_llm_cache = EmbeddingLLMCache()
+    return _shared_llm_cache
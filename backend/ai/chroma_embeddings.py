@@ -0,0 +1,55 @@
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
+from chromadb.utils.embedding_functions import register_embedding_function
+
+from ai.embeddings import DEFAULT_EMBEDDING_MODEL
+
+
+@register_embedding_function
+class SharedModelEmbeddingFunction(EmbeddingFunction[Documents]):
+    def __init__(self, embed: Callable[[str], np.ndarray]):
+        """
+        Chroma embedding function backed by the process-wide MiniLM model
+
+        Lets collections embed query_texts themselves without Chroma loading
+        a second copy of the model (as SentenceTransformerEmbeddingFunction
+        would).
+
+        Args:
+            embed: Callable returning the normalized embedding of one text
+        """
+        self._embed = embed
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return [np.asarray(self._embed(text), dtype=np.float32) for text in input]
+
+    @staticmethod
+    def name() -> str:
+        # Our own name: the shared model may be int8 quantized, so its vectors
+        # are not interchangeable with Chroma's fp32 default function
+        return "aiqr_shared_minilm"
+
+    def get_config(self) -> Dict[str, Any]:
+        return {"model_name": DEFAULT_EMBEDDING_MODEL}
+
+    @staticmethod
+    def build_from_config(config: Dict[str, Any]) -> "SharedModelEmbeddingFunction":
+        """Rebuild the function when Chroma opens a collection persisted with it"""
+        return shared_embedding_function()
+
+    def default_space(self) -> str:
+        return "cosine"
+
+    def supported_spaces(self) -> List[str]:
+        return ["cosine", "l2", "ip"]
+
+
+def shared_embedding_function() -> SharedModelEmbeddingFunction:
+    """Embedding function over the shared model, which is loaded on first use"""
+    def _embed(text: str) -> np.ndarray:
+        from ai.embeddings import get_embedding_model
+        return get_embedding_model().encode(text, convert_to_numpy=True, normalize_embeddings=True)
+
+    return SharedModelEmbeddingFunction(_embed)
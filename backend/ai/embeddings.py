@@ -0,0 +1,166 @@
+import functools
+import os
+from typing import List, Union
+
+import numpy as np
+
+DEFAULT_EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+
+# Written by export_minilm_onnx.py; used in place of PyTorch when present.
+# The int8 quantized graph is preferred over the fp32 one.
+DEFAULT_ONNX_PATHS = ('models/minilm/model_quantized.onnx', 'models/minilm/model.onnx')
+
+
+class OnnxEmbeddingModel:
+    def __init__(self, model_path: str):
+        """
+        MiniLM served through onnxruntime instead of eager PyTorch
+
+        Exposes the subset of SentenceTransformer.encode used in this
+        package: mean pooling over the last hidden state followed by
+        optional L2 normalization, both done in numpy.
+
+        Args:
+            model_path: Path to model.onnx; the tokenizer files are expected
+                in the same directory (as written by optimum's exporter)
+        """
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        so = ort.SessionOptions()
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        so.intra_op_num_threads = int(os.getenv("EMBEDDING_ONNX_THREADS", "2"))
+        self.session = ort.InferenceSession(
+            model_path,
+            sess_options=so,
+            providers=['CPUExecutionProvider']
+        )
+        self.tokenizer = AutoTokenizer.from_pretrained(os.path.dirname(model_path))
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        self.device = 'cpu'
+        self.embedding_variant = "onnx-int8" if "quantized" in os.path.basename(model_path) else "onnx-fp32"
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        convert_to_numpy: bool = True,
+        normalize_embeddings: bool = False,
+    ) -> np.ndarray:
+        """Embed one string (1-D result) or a list of strings (2-D result)"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        # Smart batching: encode in length order so each padded batch holds
+        # similarly sized texts, then restore the caller's order
+        order = np.argsort([-len(text) for text in texts], kind='stable')
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            batches.append(self._encode_batch([texts[i] for i in order[start:start + batch_size]]))
+        embeddings = np.zeros((len(texts), 384), dtype=np.float32)
+        if batches:
+            embeddings[order] = np.vstack(batches)
+
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.clip(norms, 1e-12, None)
+
+        return embeddings[0] if single else embeddings
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=256,
+            return_tensors='np'
+        )
+        feeds = {
+            name: value.astype(np.int64)
+            for name, value in encoded.items()
+            if name in self._input_names
+        }
+        last_hidden_state = self.session.run(None, feeds)[0]
+
+        # Mean pooling over real (non-padding) tokens
+        mask = encoded['attention_mask'][..., None].astype(np.float32)
+        summed = (last_hidden_state * mask).sum(axis=1)
+        return summed / np.clip(mask.sum(axis=1), 1e-9, None)
+
+
+@functools.lru_cache(maxsize=None)
+def get_embedding_model(name: str = DEFAULT_EMBEDDING_MODEL) -> "SentenceTransformer":
+    """
+    Load a SentenceTransformer once per process
+
+    MemoryLoader and the style scorers share the returned instance, so the
+    model weights are only read from disk and held in memory once.
+    sentence_transformers (and torch) are imported here rather than at
+    module level so processes that never embed text don't pay for them.
+
+    When an exported ONNX graph exists (see export_minilm_onnx.py) it is
+    served through onnxruntime instead, int8 quantized if available; set
+    EMBEDDING_ONNX_PATH to point elsewhere or to an empty string to force
+    PyTorch.
+    """
+    onnx_path = _find_onnx_model()
+    if name == DEFAULT_EMBEDDING_MODEL and onnx_path:
+        try:
+            return OnnxEmbeddingModel(onnx_path)
+        except Exception as e:
+            print(f"⚠️ Warning: Failed to load ONNX embedding model, using PyTorch: {e}")
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    # Keep torch from oversubscribing cores alongside the server's own workers
+    torch.set_num_threads(min(4, os.cpu_count() or 1))
+
+    model = SentenceTransformer(name)
+    model.eval()
+    model.embedding_variant = "torch-fp32"
+
+    # Int8 dynamic quantization of the Linear layers roughly doubles CPU
+    # throughput; set EMBEDDING_QUANTIZE=0 to keep full fp32 weights
+    if os.getenv("EMBEDDING_QUANTIZE", "1") != "0" and str(model.device) == "cpu":
+        model = _quantize_dynamic(model)
+
+    return model
+
+
+def embedding_variant() -> str:
+    """
+    Which MiniLM vectors the shared model produces, e.g. "all-MiniLM-L6-v2:onnx-int8"
+
+    int8 and fp32 weights give slightly different vectors, so collections
+    record the variant they were indexed with (see ai.vector_store).
+    """
+    model = get_embedding_model()
+    return f"{DEFAULT_EMBEDDING_MODEL}:{getattr(model, 'embedding_variant', 'unknown')}"
+
+
+def _find_onnx_model():
+    """Path of the ONNX graph to serve, or None to use PyTorch"""
+    configured = os.getenv("EMBEDDING_ONNX_PATH")
+    candidates = (configured,) if configured is not None else DEFAULT_ONNX_PATHS
+    for path in candidates:
+        if path and os.path.exists(path):
+            return path
+    return None
+
+
+def _quantize_dynamic(model: "SentenceTransformer") -> "SentenceTransformer":
+    """Swap the transformer's Linear layers for int8 dynamically quantized ones"""
+    try:
+        import torch
+        transformer = model[0]
+        transformer.auto_model = torch.quantization.quantize_dynamic(
+            transformer.auto_model,
+            {torch.nn.Linear},
+            dtype=torch.qint8
+        )
+        model.embedding_variant = "torch-int8"
+    except Exception as e:
+        print(f"⚠️ Warning: Embedding model quantization failed, using fp32: {e}")
+    return model
@@ -1,8 +1,14 @@
 import google.generativeai as genai
+import asyncio
+import json
 import os
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, Iterator, List, Union
 from dotenv import load_dotenv
 
+from ai.cache import ResponseCache, get_response_cache
+from ai.prompts import REPORT_RESPONSE_SCHEMA, REPORT_USER_TEMPLATE, format_metrics
+from ai.retry import gemini_retry
+
 load_dotenv()
 
 class ReportGenerator:
@@ -13,7 +19,12 @@ class ReportGenerator:
             raise ValueError("GEMINI_API_KEY not found in environment variables")
         
         genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
+        self.model_name = 'gemini-2.5-flash'
+        self.model = genai.GenerativeModel(self.model_name)
+        self.temperature = float(os.getenv("GEMINI_TEMPERATURE", "0.3"))
+        
+        # Completions are only reused when sampling is deterministic
+        self.response_cache = get_response_cache()
         
         # System prompt for generating reports
         self.system_prompt = """You are a professional financial analyst writing quarterly equity market reports for institutional investors. 
@@ -37,6 +48,11 @@ STRICT RULES:
 - Maintain consistency with the professional financial reporting style
 
 The report should sound authoritative and similar to institutional investment commentary."""
+        
+        # Static prompt pieces are joined once here; per call only the
+        # formatted metrics are concatenated in
+        self._full_prefix = self.system_prompt + "\n\n"
+        self._user_head, self._user_tail = REPORT_USER_TEMPLATE.split("{metrics_text}")
 
     def generate(self, metrics: Dict[str, Any]) -> str:
         """
@@ -49,94 +65,194 @@ The report should sound authoritative and similar to institutional investment co
             str: Generated quarterly report
         """
         try:
-            # Format metrics for the prompt
-            metrics_text = self._format_metrics(metrics)
+            user_prompt = self._build_user_prompt(metrics)
+            return self._generate_cached(user_prompt)
             
-            user_prompt = f"""Generate a two-paragraph quarterly equity market report using these metrics:
-
-{metrics_text}
-
-Remember: 
-- Use ONLY these numbers
-- First paragraph: ACWI global markets
-- Second paragraph: S&P 500 performance  
-- Match the style of professional quarterly reports
-- Be specific with percentages and record highs"""
-
-            full_prompt = f"{self.system_prompt}\n\n{user_prompt}"
-            
-            response = self.model.generate_content(
-                full_prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.3,
-                    max_output_tokens=800,
-                )
-            )
-            
-            report = response.text.strip()
+        except Exception as e:
+            raise Exception(f"Failed to generate report: {str(e)}")
+    
+    async def generate_async(self, metrics: Dict[str, Any]) -> str:
+        """Async version of generate, retrying transient Gemini errors"""
+        try:
+            user_prompt = self._build_user_prompt(metrics)
             
-            # Basic validation
-            if not report or len(report.split('\n\n')) < 2:
-                raise Exception("Generated report does not contain required two paragraphs")
+            cache_key = self._cache_key(user_prompt)
+            if cache_key is not None:
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    return cached
             
-            return report
+            response = await self._call_model_async_with_retry(user_prompt, self._json_generation_config())
+            return self._finalize_report(self._parse_report_json(response.text), cache_key)
             
         except Exception as e:
             raise Exception(f"Failed to generate report: {str(e)}")
     
-    def _format_metrics(self, metrics: Dict[str, Any]) -> str:
-        """Format metrics for the prompt"""
-        formatted = []
-        for key, value in metrics.items():
-            if isinstance(value, (int, float)):
-                formatted.append(f"- {key.replace('_', ' ').title()}: {value}%")
-            else:
-                formatted.append(f"- {key.replace('_', ' ').title()}: {value}")
+    async def generate_many(self, metrics_list: List[Dict[str, Any]], max_concurrency: int = 8) -> List[Union[str, Exception]]:
+        """
+        Generate reports for several metric sets concurrently
         
-        return "\n".join(formatted)
-
-# Synchronous wrapper for compatibility
-class SyncReportGenerator(ReportGenerator):
-    def __init__(self):
-        super().__init__()
+        Args:
+            metrics_list: One metrics dictionary per report (e.g. per quarter)
+            max_concurrency: Maximum number of in-flight Gemini requests
+            
+        Returns:
+            list: Report text, or the raised Exception, for each input in order
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
         
-    def generate_sync(self, metrics: Dict[str, Any]) -> str:
-        """Synchronous version of generate method"""
-        try:
-            # Format metrics for the prompt
-            metrics_text = self._format_metrics(metrics)
+        async def _one(metrics: Dict[str, Any]) -> str:
+            async with semaphore:
+                return await self.generate_async(metrics)
+        
+        # return_exceptions keeps one failed quarter from failing the whole batch
+        return await asyncio.gather(*(_one(m) for m in metrics_list), return_exceptions=True)
+    
+    def generate_stream(self, metrics: Dict[str, Any]) -> Iterator[str]:
+        """
+        Stream a quarterly report as Gemini produces it
+        
+        Args:
+            metrics: Dictionary containing computed financial metrics
             
-            user_prompt = f"""Generate a two-paragraph quarterly equity market report using these metrics:
-
-{metrics_text}
-
-Remember: 
-- Use ONLY these numbers
-- First paragraph: ACWI global markets
-- Second paragraph: S&P 500 performance  
-- Match the style of professional quarterly reports
-- Be specific with percentages and record highs"""
+        Yields:
+            str: Report text chunks in generation order
+        """
+        user_prompt = self._build_user_prompt(metrics)
+        
+        cache_key = self._cache_key(user_prompt)
+        if cache_key is not None:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+        
+        yield from self._stream_text(user_prompt)
+    
+    async def generate_stream_async(self, metrics: Dict[str, Any]) -> AsyncIterator[str]:
+        """Async variant of generate_stream for use inside an event loop"""
+        user_prompt = self._build_user_prompt(metrics)
+        
+        cache_key = self._cache_key(user_prompt)
+        if cache_key is not None:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                yield cached
+                return
+        
+        response = await self._call_model_async(user_prompt, self._generation_config(), stream=True)
+        async for chunk in response:
+            text = self._chunk_text(chunk)
+            if text:
+                yield text
+    
+    def _build_user_prompt(self, metrics: Dict[str, Any]) -> str:
+        """Build the per-request part of the prompt"""
+        return self._user_head + format_metrics(metrics) + self._user_tail
+    
+    def _generation_config(self):
+        return genai.types.GenerationConfig(
+            temperature=self.temperature,
+            max_output_tokens=800,
+        )
+    
+    def _json_generation_config(self):
+        """
+        Generation config asking for the two paragraphs as a JSON object
+        
+        max_output_tokens stays at 800: gemini-2.5-flash counts its thinking
+        tokens against the cap, so a tighter limit risks truncated JSON.
+        """
+        return genai.types.GenerationConfig(
+            temperature=self.temperature,
+            max_output_tokens=800,
+            response_mime_type="application/json",
+            response_schema=REPORT_RESPONSE_SCHEMA,
+        )
+    
+    @staticmethod
+    def _parse_report_json(text: str) -> str:
+        """Join the paragraph fields of a JSON-mode response into report text"""
+        data = json.loads(text)
+        return f"{data['acwi_paragraph'].strip()}\n\n{data['sp500_paragraph'].strip()}"
+    
+    def _call_model(self, user_prompt: str, generation_config, stream: bool = False):
+        """Send the system prompt and the user prompt in one request"""
+        return self.model.generate_content(
+            self._full_prefix + user_prompt,
+            generation_config=generation_config,
+            stream=stream
+        )
+    
+    async def _call_model_async(self, user_prompt: str, generation_config, stream: bool = False):
+        """Async counterpart of _call_model"""
+        return await self.model.generate_content_async(
+            self._full_prefix + user_prompt,
+            generation_config=generation_config,
+            stream=stream
+        )
+    
+    @gemini_retry
+    def _call_model_with_retry(self, user_prompt: str, generation_config):
+        return self._call_model(user_prompt, generation_config)
+    
+    @gemini_retry
+    async def _call_model_async_with_retry(self, user_prompt: str, generation_config):
+        return await self._call_model_async(user_prompt, generation_config)
+    
+    def _stream_text(self, user_prompt: str) -> Iterator[str]:
+        """Yield text chunks from a streaming Gemini call"""
+        response = self._call_model(user_prompt, self._generation_config(), stream=True)
+        for chunk in response:
+            text = self._chunk_text(chunk)
+            if text:
+                yield text
+    
+    @staticmethod
+    def _chunk_text(chunk) -> str:
+        """Text of a streamed chunk (empty for chunks without content parts)"""
+        try:
+            return chunk.text
+        except ValueError:
+            return ""
+    
+    def _cache_key(self, user_prompt: str):
+        """Response cache key, or None when sampling is non-deterministic"""
+        if self.temperature > 0:
+            return None
+        return ResponseCache.key_for(self.model_name, self._full_prefix + user_prompt, self.temperature)
+    
+    def _generate_cached(self, user_prompt: str) -> str:
+        """
+        Call Gemini for a prompt, reusing cached completions when possible
+        
+        Responses are cached (memory + data/llm_cache.json) only when the
+        temperature is <= 0, since only then is the output deterministic.
+        """
+        cache_key = self._cache_key(user_prompt)
+        if cache_key is not None:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        response = self._call_model_with_retry(user_prompt, self._json_generation_config())
+        return self._finalize_report(self._parse_report_json(response.text), cache_key)
+    
+    def _finalize_report(self, report: str, cache_key) -> str:
+        """Validate a generated report and store it in the response cache"""
+        # Basic validation
+        if not report or len(report.split('\n\n')) < 2:
+            raise Exception("Generated report does not contain required two paragraphs")
+        
+        if cache_key is not None:
+            self.response_cache.set(cache_key, report)
+        
+        return report
 
-            full_prompt = f"{self.system_prompt}\n\n{user_prompt}"
-            
-            response = self.model.generate_content(
-                full_prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.3,
-                    max_output_tokens=800,
-                )
-            )
-            
-            report = response.text.strip()
-            
-            # Basic validation
-            if not report or len(report.split('\n\n')) < 2:
-                raise Exception("Generated report does not contain required two paragraphs")
-            
-            return report
-            
-        except Exception as e:
-            raise Exception(f"Failed to generate report: {str(e)}")
+# Synchronous wrapper for compatibility
+class SyncReportGenerator(ReportGenerator):
+    # generate() is already synchronous
+    generate_sync = ReportGenerator.generate
 
 if __name__ == "__main__":
     # Test the generator
@@ -1,8 +1,12 @@
 import google.generativeai as genai
 import os
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, Iterator
 from dotenv import load_dotenv
 
+from ai.cache import ResponseCache, get_response_cache
+from ai.prompts import SIMPLE_REPORT_TEMPLATE, format_metrics
+from ai.retry import gemini_retry
+
 load_dotenv()
 
 class ReportGenerator:
@@ -10,11 +14,20 @@ class ReportGenerator:
         """Initialize the Report Generator with Gemini client"""
         self.api_key = os.getenv("GEMINI_API_KEY")
         self.model = None
+        self.model_name = 'gemini-2.5-flash'
+        
+        # Optional sampling temperature; completions are only cached when it is <= 0
+        temperature = os.getenv("GEMINI_TEMPERATURE")
+        self.temperature = float(temperature) if temperature else None
+        self.response_cache = get_response_cache()
+        
+        # Split the template once so each call only concatenates the metrics
+        self._prompt_head, self._prompt_tail = SIMPLE_REPORT_TEMPLATE.split("{metrics_text}")
         
         if self.api_key:
             try:
                 genai.configure(api_key=self.api_key)
-                self.model = genai.GenerativeModel('gemini-2.5-flash')
+                self.model = genai.GenerativeModel(self.model_name)
             except Exception as e:
                 print(f"Warning: Failed to initialize Gemini model: {e}")
         else:
@@ -29,41 +42,170 @@ class ReportGenerator:
             return "Error: Gemini model not initialized. Please check your API key."
             
         try:
-            # Format metrics for the prompt
-            metrics_text = self._format_metrics(metrics)
+            prompt = self._build_prompt(metrics)
+            
+            cache_key = self._cache_key(prompt)
+            if cache_key is not None:
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            
+            response = self._call_model(prompt)
+            
+            report = self._extract_text(response)
+            if cache_key is not None:
+                self.response_cache.set(cache_key, report)
+            
+            return report
             
-            prompt = f"""Generate a professional two-paragraph quarterly equity market report using these exact metrics:
+        except Exception as e:
+            return f"Error generating report: {str(e)}"
 
-{metrics_text}
+    async def generate_async(self, metrics: Dict[str, Any]) -> str:
+        """Async version of generate; the Gemini call doesn't hold a thread"""
+        if not self.api_key:
+            return "Error: GEMINI_API_KEY not configured. Please set the API key in environment variables."
+        
+        if not self.model:
+            return "Error: Gemini model not initialized. Please check your API key."
+            
+        try:
+            prompt = self._build_prompt(metrics)
+            
+            cache_key = self._cache_key(prompt)
+            if cache_key is not None:
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            
+            response = await self._call_model_async(prompt)
+            
+            report = self._extract_text(response)
+            if cache_key is not None:
+                self.response_cache.set(cache_key, report)
+            
+            return report
+            
+        except Exception as e:
+            return f"Error generating report: {str(e)}"
 
-Requirements:
-- First paragraph: Focus on ACWI (global markets performance)
-- Second paragraph: Focus on S&P 500 performance
-- Use the exact numbers provided
-- Keep it professional and factual
-- Each paragraph should be 3-4 sentences"""
+    def generate_stream(self, metrics: Dict[str, Any]) -> Iterator[str]:
+        """Stream a quarterly report chunk by chunk as Gemini generates it"""
+        if not self.api_key:
+            yield "Error: GEMINI_API_KEY not configured. Please set the API key in environment variables."
+            return
+        
+        if not self.model:
+            yield "Error: Gemini model not initialized. Please check your API key."
+            return
+        
+        try:
+            prompt = self._build_prompt(metrics)
+            
+            cache_key = self._cache_key(prompt)
+            if cache_key is not None:
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    yield cached
+                    return
+            
+            response = self._call_model(prompt, stream=True)
+            
+            chunks = []
+            for chunk in response:
+                text = self._chunk_text(chunk)
+                if text:
+                    chunks.append(text)
+                    yield text
+            
+            self._cache_streamed(cache_key, chunks)
+                
+        except Exception as e:
+            yield f"Error generating report: {str(e)}"
 
-            response = self.model.generate_content(prompt)
+    async def generate_stream_async(self, metrics: Dict[str, Any]) -> AsyncIterator[str]:
+        """Async version of generate_stream; chunks are awaited, not read on a thread"""
+        if not self.api_key:
+            yield "Error: GEMINI_API_KEY not configured. Please set the API key in environment variables."
+            return
+        
+        if not self.model:
+            yield "Error: Gemini model not initialized. Please check your API key."
+            return
+        
+        try:
+            prompt = self._build_prompt(metrics)
             
-            # Handle different response formats
-            if hasattr(response, 'text') and response.text:
-                return response.text.strip()
-            elif hasattr(response, 'candidates') and response.candidates:
-                if response.candidates[0].content.parts:
-                    return response.candidates[0].content.parts[0].text.strip()
+            cache_key = self._cache_key(prompt)
+            if cache_key is not None:
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    yield cached
+                    return
             
-            raise Exception("No valid response from AI model")
+            response = await self._call_model_async(prompt, stream=True)
+            
+            chunks = []
+            async for chunk in response:
+                text = self._chunk_text(chunk)
+                if text:
+                    chunks.append(text)
+                    yield text
             
+            self._cache_streamed(cache_key, chunks)
+                
         except Exception as e:
-            return f"Error generating report: {str(e)}"
+            yield f"Error generating report: {str(e)}"
+
+    @gemini_retry
+    def _call_model(self, prompt: str, stream: bool = False):
+        """Call Gemini, backing off and retrying on rate limits and overloads"""
+        return self.model.generate_content(prompt, stream=stream, **self._generation_kwargs())
+
+    @gemini_retry
+    async def _call_model_async(self, prompt: str, stream: bool = False):
+        """Async counterpart of _call_model"""
+        return await self.model.generate_content_async(prompt, stream=stream, **self._generation_kwargs())
+
+    def _build_prompt(self, metrics: Dict[str, Any]) -> str:
+        """Build the report prompt for the given metrics"""
+        return self._prompt_head + format_metrics(metrics) + self._prompt_tail
+
+    def _cache_key(self, prompt: str):
+        """Response cache key, or None unless sampling is deterministic"""
+        if self.temperature is None or self.temperature > 0:
+            return None
+        return ResponseCache.key_for(self.model_name, prompt, self.temperature)
+
+    def _generation_kwargs(self) -> Dict[str, Any]:
+        """Extra generate_content kwargs (temperature only when configured)"""
+        if self.temperature is None:
+            return {}
+        return {"generation_config": genai.types.GenerationConfig(temperature=self.temperature)}
+
+    @staticmethod
+    def _chunk_text(chunk) -> str:
+        """Text of a streamed chunk (empty for chunks without content parts, e.g. the final finish-reason chunk)"""
+        try:
+            return chunk.text
+        except ValueError:
+            return ""
+
+    def _cache_streamed(self, cache_key, chunks) -> None:
+        """Cache a fully streamed report, raising if Gemini sent no text"""
+        report = "".join(chunks).strip()
+        if not report:
+            raise Exception("No valid response from AI model")
+        if cache_key is not None:
+            self.response_cache.set(cache_key, report)
 
-    def _format_metrics(self, metrics: Dict[str, Any]) -> str:
-        """Format metrics for the prompt"""
-        formatted = []
-        for key, value in metrics.items():
-            if isinstance(value, (int, float)):
-                formatted.append(f"- {key.replace('_', ' ').title()}: {value}%")
-            else:
-                formatted.append(f"- {key.replace('_', ' ').title()}: {value}")
+    def _extract_text(self, response) -> str:
+        """Pull the generated text out of a Gemini response"""
+        # Handle different response formats
+        if hasattr(response, 'text') and response.text:
+            return response.text.strip()
+        elif hasattr(response, 'candidates') and response.candidates:
+            if response.candidates[0].content.parts:
+                return response.candidates[0].content.parts[0].text.strip()
         
-        return "\n".join(formatted)
\ No newline at end of file
+        raise Exception("No valid response from AI model")
@@ -1,37 +1,43 @@
-import chromadb
+import numpy as np
 import os
+import re
 from typing import List
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer
+
+from ai.embeddings import get_embedding_model
+from ai.vec_index import get_vec_index
+from ai.vector_store import COLLECTION_NAME, create_report_collection, get_chroma_client
 
 load_dotenv()
 
+# Patterns used to split and normalize past_reports.txt
+_QUARTER_SPLIT_RE = re.compile(r'(Q[1-4] \d{4})')
+_QUARTER_MATCH_RE = re.compile(r'Q[1-4] \d{4}')
+_MULTI_NEWLINE_RE = re.compile(r'\n+')
+_MULTI_SPACE_RE = re.compile(r' +')
+
 class MemoryLoader:
     def __init__(self):
         """Initialize Memory Loader for ChromaDB"""
         self.embedding_model = None  # Lazy load
         
-        # Initialize ChromaDB - use in-memory for ephemeral environments (like Render)
-        # Falls back to persistent storage for local development
+        # Shared ChromaDB client - in-memory for ephemeral environments (like Render),
+        # persistent storage for local development
+        self.chroma_client = get_chroma_client()
         if os.getenv('RENDER'):
-            # In-memory client for production (Render has ephemeral storage)
-            self.chroma_client = chromadb.EphemeralClient()
             print("🔄 Using ChromaDB in-memory mode (ephemeral storage)")
         else:
-            # Persistent client for local development
-            self.chroma_client = chromadb.PersistentClient(path="./chroma_db")
             print("💾 Using ChromaDB persistent mode (local storage)")
         
         # Collection name
-        self.collection_name = "quarterly_reports"
+        self.collection_name = COLLECTION_NAME
     
     def _get_embedding_model(self):
         """Lazy load the embedding model"""
         if self.embedding_model is None:
             try:
-                # Use smaller model for lower memory usage
-                from sentence_transformers import SentenceTransformer
-                self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+                # Use smaller model for lower memory usage (shared with the style scorers)
+                self.embedding_model = get_embedding_model()
                 print("📊 Embedding model loaded (MiniLM-L6-v2)")
             except Exception as e:
                 print(f"⚠️ Warning: Failed to load embedding model: {e}")
@@ -60,29 +66,16 @@ class MemoryLoader:
             if not reports:
                 raise ValueError("No reports found in the file")
             
-            # Delete existing collection and create new one
-            try:
-                self.chroma_client.delete_collection(self.collection_name)
-            except:
-                pass  # Collection might not exist
-            
-            collection = self.chroma_client.create_collection(
-                name=self.collection_name,
-                metadata={"description": "Historical quarterly reports for style matching"}
-            )
+            # Replace any existing collection (re-indexes stale ones too)
+            collection = create_report_collection(self.chroma_client)
             
-            # Generate embeddings and store reports
-            embeddings = []
+            # Collect documents and metadata in one pass
             documents = []
             metadatas = []
             ids = []
             
             for i, report in enumerate(reports):
                 if report['text'].strip():
-                    # Generate embedding
-                    embedding = self._get_embedding_sync(report['text'])
-                    
-                    embeddings.append(embedding)
                     documents.append(report['text'])
                     metadatas.append({
                         "quarter": report['quarter'],
@@ -91,8 +84,11 @@ class MemoryLoader:
                     })
                     ids.append(f"report_{i}_{report['quarter'].replace(' ', '_')}")
             
+            # Embed all reports in a single batched forward pass
+            embeddings = self._get_embeddings_batch(documents) if documents else []
+            
             # Add to collection
-            if embeddings:
+            if len(embeddings):
                 collection.add(
                     embeddings=embeddings,
                     documents=documents,
@@ -101,6 +97,12 @@ class MemoryLoader:
                 )
                 
                 print(f"✅ Loaded {len(embeddings)} reports into ChromaDB")
+                
+                # Dual-write to the sqlite-vec index used for local similarity search
+                vec_index = get_vec_index()
+                if vec_index is not None:
+                    vec_index.replace_all(embeddings)
+                    print(f"✅ Indexed {len(embeddings)} reports in sqlite-vec")
                 return True
             else:
                 raise ValueError("No valid reports to load")
@@ -114,20 +116,18 @@ class MemoryLoader:
         reports = []
         
         # Split by quarters (Q1, Q2, Q3, Q4 followed by year)
-        import re
-        pattern = r'(Q[1-4] \d{4})'
-        parts = re.split(pattern, content)
+        parts = _QUARTER_SPLIT_RE.split(content)
         
         current_quarter = None
         for i, part in enumerate(parts):
-            if re.match(r'Q[1-4] \d{4}', part.strip()):
+            if _QUARTER_MATCH_RE.match(part.strip()):
                 current_quarter = part.strip()
             elif current_quarter and part.strip():
                 # Clean up the text
                 text = part.strip()
                 # Remove extra whitespace and normalize
-                text = re.sub(r'\n+', '\n\n', text)
-                text = re.sub(r' +', ' ', text)
+                text = _MULTI_NEWLINE_RE.sub('\n\n', text)
+                text = _MULTI_SPACE_RE.sub(' ', text)
                 
                 reports.append({
                     "quarter": current_quarter,
@@ -136,13 +136,20 @@ class MemoryLoader:
         
         return reports
     
-    def _get_embedding_sync(self, text: str) -> List[float]:
-        """Generate embedding using SentenceTransformers (synchronous)"""
+    def _get_embeddings_batch(self, texts: List[str]) -> np.ndarray:
+        """Generate embeddings for many texts with one batched encode call"""
         model = self._get_embedding_model()
         if model is None:
             raise Exception("Embedding model not available")
-        embedding = model.encode(text)
-        return embedding.tolist()
+        embeddings = model.encode(
+            texts,
+            batch_size=64,
+            show_progress_bar=False,
+            normalize_embeddings=True,
+            convert_to_numpy=True
+        )
+        # fp16 halves the bytes handed to Chroma; no per-value Python floats
+        return embeddings.astype(np.float16)
     
     def get_collection_status(self) -> dict:
         """Get status of the ChromaDB collection"""
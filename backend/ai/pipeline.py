@@ -0,0 +1,162 @@
+import google.generativeai as genai
+import asyncio
+import json
+from typing import Dict, Any, List
+
+from ai.async_utils import run_sync
+from ai.cache import get_llm_cache, hash_key
+from ai.prompts import (
+    ANALYZE_AND_VALIDATE_SCHEMA,
+    ANALYZE_AND_VALIDATE_TEMPLATE,
+    LANGUAGE_QUALITY_PROPERTIES,
+    format_metrics_lines,
+)
+from ai.retry import gemini_retry
+
+class AiPipeline:
+    def __init__(self, style_scorer, validator):
+        """
+        Style scoring and validation of a report with a single Gemini call
+        
+        Args:
+            style_scorer: ai.style_scorer_simple.StyleScorer (structure,
+                historical similarity and the Gemini model)
+            validator: ai.validator_simple.ReportValidator (deterministic checks)
+        """
+        self.style_scorer = style_scorer
+        self.validator = validator
+        self.llm_cache = get_llm_cache()
+    
+    def analyze_and_validate(self, report: str, metrics: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Score the report's style and validate it against the metrics
+        
+        Args:
+            report: Generated report text
+            metrics: Original metrics used for generation
+            
+        Returns:
+            dict: {"style": score_sync-style result, "validation": validate-style result}
+        """
+        return run_sync(self.analyze_and_validate_async(report, metrics))
+    
+    async def analyze_and_validate_async(self, report: str, metrics: Dict[str, Any]) -> Dict[str, Any]:
+        """Async version of analyze_and_validate"""
+        scorer = self.style_scorer
+        
+        unavailable = scorer._unavailable_result()
+        if unavailable is not None:
+            return {
+                "style": unavailable,
+                "validation": await self.validator.validate_async(report, metrics)
+            }
+        
+        try:
+            structural = scorer._analyze_structure(report)
+            deterministic_errors = self.validator._deterministic_errors(report, metrics)
+            
+            # One embedding for the cache lookup and the similarity query; the
+            # combined Gemini call overlaps with the similarity search
+            embeddings = await asyncio.to_thread(scorer._embed_reports, [report])
+            embedding = embeddings[0] if embeddings is not None else None
+            data, similarity = await asyncio.gather(
+                self._analyze_with_gemini(report, metrics, embedding),
+                asyncio.to_thread(scorer._analyze_historical_similarity_batch, [report], embeddings)
+            )
+            
+            if "valid" in data:
+                validation = self._validation_result(deterministic_errors, data)
+            else:
+                # Language ratings reused from a near-duplicate report; the
+                # verdict is never reused that way, so validate on its own
+                validation = await self.validator.validate_async(report, metrics)
+            
+            return {
+                "style": scorer._build_result(structural, scorer._language_from_json(data), similarity[0]),
+                "validation": validation
+            }
+            
+        except Exception as e:
+            return {
+                "style": scorer._failed_result(e),
+                "validation": {
+                    "valid": False,
+                    "deterministic_valid": False,
+                    "semantic_valid": False,
+                    "errors": [f"Validation failed: {str(e)}"],
+                    "details": {}
+                }
+            }
+    
+    async def _analyze_with_gemini(self, report: str, metrics: Dict[str, Any], embedding=None) -> Dict[str, Any]:
+        """
+        Language ratings and semantic verdict from one structured-output call
+        
+        The full answer is reused only for the exact same report and metrics:
+        a near-duplicate can differ in exactly the fact the verdict is about
+        ("rose" vs "fell"). Near-duplicates reuse the language ratings alone,
+        and the returned dict then has no "valid" key.
+        """
+        scope = hash_key(metrics)
+        # The cache may query Chroma, so keep it off the event loop thread
+        if self.llm_cache is not None:
+            cached = await asyncio.to_thread(
+                self.llm_cache.get, "analyze_and_validate", report, scope=scope, semantic=False
+            )
+            if cached is not None:
+                return cached
+            language = await asyncio.to_thread(
+                self.llm_cache.get, "analyze_language", report, embedding=embedding
+            )
+            if language is not None:
+                return language
+        
+        prompt = ANALYZE_AND_VALIDATE_TEMPLATE.format(metrics_text=format_metrics_lines(metrics), report=report)
+        
+        response = await self._generate_async(
+            prompt,
+            genai.types.GenerationConfig(
+                temperature=0.1,
+                max_output_tokens=800,
+                candidate_count=1,
+                response_mime_type="application/json",
+                response_schema=ANALYZE_AND_VALIDATE_SCHEMA,
+            )
+        )
+        data = json.loads(response.text)
+        
+        if self.llm_cache is not None:
+            language = {key: data[key] for key in LANGUAGE_QUALITY_PROPERTIES if key in data}
+            await asyncio.to_thread(
+                self.llm_cache.set, "analyze_and_validate", report, data, scope=scope, semantic=False
+            )
+            await asyncio.to_thread(
+                self.llm_cache.set, "analyze_language", report, language, embedding=embedding
+            )
+        
+        return data
+    
+    @gemini_retry
+    async def _generate_async(self, prompt: str, generation_config):
+        """Async Gemini call, retried with backoff on rate limits and 5xx errors"""
+        return await self.style_scorer.model.generate_content_async(prompt, generation_config=generation_config)
+    
+    def _validation_result(self, deterministic_errors: List[str], data: Dict[str, Any]) -> Dict[str, Any]:
+        """Validation result in the same shape as ReportValidator.validate"""
+        ai_validation = bool(data.get("valid", False))
+        semantic_errors = []
+        if not ai_validation:
+            semantic_errors = [f"Semantic issue: {issue}" for issue in data.get("issues", []) if issue]
+            if not semantic_errors:
+                semantic_errors = ["AI detected inaccuracies"]
+        
+        return {
+            "valid": len(deterministic_errors) == 0 and ai_validation,
+            "deterministic_valid": len(deterministic_errors) == 0,
+            "semantic_valid": ai_validation,
+            "errors": deterministic_errors + semantic_errors,
+            "details": {
+                "deterministic_errors": deterministic_errors,
+                "semantic_errors": semantic_errors
+            }
+        }
@@ -0,0 +1,186 @@
+from functools import lru_cache
+from typing import Any, Dict, Tuple
+
+# Per-request prompt templates; only the metrics slot changes between calls
+REPORT_USER_TEMPLATE = """Generate a two-paragraph quarterly equity market report using these metrics:
+
+{metrics_text}
+
+Remember: 
+- Use ONLY these numbers
+- First paragraph: ACWI global markets
+- Second paragraph: S&P 500 performance  
+- Match the style of professional quarterly reports
+- Be specific with percentages and record highs"""
+
+SIMPLE_REPORT_TEMPLATE = """Generate a professional two-paragraph quarterly equity market report using these exact metrics:
+
+{metrics_text}
+
+Requirements:
+- First paragraph: Focus on ACWI (global markets performance)
+- Second paragraph: Focus on S&P 500 performance
+- Use the exact numbers provided
+- Keep it professional and factual
+- Each paragraph should be 3-4 sentences"""
+
+# Structured output for the report: one field per paragraph, so Gemini skips
+# free-text framing and the two paragraphs come back already separated
+REPORT_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "acwi_paragraph": {"type": "string"},
+        "sp500_paragraph": {"type": "string"},
+    },
+    "required": ["acwi_paragraph", "sp500_paragraph"],
+}
+
+# Language-quality dimensions rated 0-10 by Gemini, each with a short comment
+LANGUAGE_DIMENSIONS = ("tone", "clarity", "coherence", "engagement")
+LANGUAGE_QUALITY_PROPERTIES = {}
+for _dimension in LANGUAGE_DIMENSIONS:
+    LANGUAGE_QUALITY_PROPERTIES[_dimension] = {"type": "integer"}
+    LANGUAGE_QUALITY_PROPERTIES[f"{_dimension}_comment"] = {"type": "string"}
+
+LANGUAGE_QUALITY_SCHEMA = {
+    "type": "object",
+    "properties": LANGUAGE_QUALITY_PROPERTIES,
+    "required": list(LANGUAGE_QUALITY_PROPERTIES),
+}
+
+# Fact-check verdict returned by the validators' semantic pass
+SEMANTIC_VALIDATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "valid": {"type": "boolean"},
+        "issues": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["valid", "issues"],
+}
+
+# Several semantic verdicts from one call, each tagged with its report's id
+BATCH_VALIDATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "results": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "string"},
+                    **SEMANTIC_VALIDATION_SCHEMA["properties"],
+                },
+                "required": ["id", *SEMANTIC_VALIDATION_SCHEMA["required"]],
+            },
+        },
+    },
+    "required": ["results"],
+}
+
+SEMANTIC_VALIDATION_TEMPLATE = """You are validating a financial report for accuracy and factual consistency.
+
+METRICS PROVIDED:
+{metrics_text}
+
+REPORT TO VALIDATE:
+{report}
+
+Your task: Identify any fabricated facts, unsupported claims, or information that contradicts the provided metrics.
+
+VALIDATION CRITERIA:
+- Are there any specific companies mentioned that weren't in the metrics?
+- Are there any economic events or factors mentioned that can't be derived from the metrics?
+- Are there any claims about market drivers that go beyond what the numbers show?
+- Does the report contain any information not supported by the provided metrics?
+
+Set "valid" to true or false and list the specific problems found in "issues" (empty if valid).
+
+Be strict - if anything cannot be directly supported by the metrics, mark as invalid."""
+
+# Combined style + validation answer for the single-call pipeline
+ANALYZE_AND_VALIDATE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        **LANGUAGE_QUALITY_PROPERTIES,
+        "valid": {"type": "boolean"},
+        "issues": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": [*LANGUAGE_QUALITY_PROPERTIES, "valid", "issues"],
+}
+
+ANALYZE_AND_VALIDATE_TEMPLATE = """You are reviewing a quarterly equity market report for institutional investors.
+
+METRICS PROVIDED:
+{metrics_text}
+
+REPORT:
+{report}
+
+PART 1 - Rate the writing from 0-10 on each dimension, with a brief comment:
+- tone: Professional, authoritative, appropriate for institutional investors
+- clarity: Clear, concise, easy to understand without jargon overload
+- coherence: Logical flow, smooth transitions between ideas
+- engagement: Compelling narrative while remaining factual
+
+PART 2 - Validate the report against the metrics:
+- valid: false if the report mentions companies, economic events or market drivers that cannot be derived from the metrics, or contradicts them
+- issues: the specific problems found (empty list if valid)
+
+Be strict in part 2 - if anything cannot be directly supported by the metrics, mark it invalid."""
+
+
+@lru_cache(maxsize=128)
+def _format_metric_items(items: Tuple[Tuple[str, type, Any], ...]) -> str:
+    formatted = []
+    for key, _, value in items:
+        if isinstance(value, (int, float)):
+            formatted.append(f"- {key.replace('_', ' ').title()}: {value}%")
+        else:
+            formatted.append(f"- {key.replace('_', ' ').title()}: {value}")
+    
+    return "\n".join(formatted)
+
+
+@lru_cache(maxsize=128)
+def _format_metric_lines(items: Tuple[Tuple[str, type, Any], ...]) -> str:
+    return "\n".join(f"- {key}: {value}" for key, _, value in items)
+
+
+@lru_cache(maxsize=128)
+def _format_metric_inline(items: Tuple[Tuple[str, type, Any], ...]) -> str:
+    return ", ".join(f"{key}: {value}" for key, _, value in items)
+
+
+def _memoized_format(formatter, metrics: Dict[str, Any]) -> str:
+    """
+    Run an lru_cached formatter on the (ordered) metric items
+
+    Each item carries its value's type: 1, 1.0 and True hash and compare
+    equal, so without it they would share a cache entry and print alike.
+    """
+    items = tuple((key, type(value), value) for key, value in metrics.items())
+    try:
+        return formatter(items)
+    except TypeError:
+        # Unhashable values (lists, dicts) can't be cached
+        return formatter.__wrapped__(items)
+
+
+def format_metrics(metrics: Dict[str, Any]) -> str:
+    """
+    Format metrics as '- Metric Name: value' lines for the report prompts
+    
+    Results are memoized on the (ordered) metric items, so repeated calls
+    with the same metrics skip rebuilding the string.
+    """
+    return _memoized_format(_format_metric_items, metrics)
+
+
+def format_metrics_lines(metrics: Dict[str, Any]) -> str:
+    """Format metrics as raw '- key: value' lines for the validation prompts (memoized)"""
+    return _memoized_format(_format_metric_lines, metrics)
+
+
+def format_metrics_inline(metrics: Dict[str, Any]) -> str:
+    """Format metrics as a 'key: value, key: value' line for the simple validator (memoized)"""
+    return _memoized_format(_format_metric_inline, metrics)
@@ -0,0 +1,18 @@
+from google.api_core import exceptions as google_exceptions
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential_jitter
+
+# Transient Gemini failures (rate limits, overload, timeouts) worth retrying
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+)
+
+# Exponential backoff with jitter for Gemini calls (sync or async functions)
+gemini_retry = retry(
+    stop=stop_after_attempt(5),
+    wait=wait_exponential_jitter(initial=0.5, max=8),
+    retry=retry_if_exception_type(RETRYABLE_ERRORS),
+    reraise=True
+)
@@ -1,8 +1,11 @@
-import chromadb
-import os
-from typing import Dict, Any, List
+import hashlib
+import numpy as np
+from typing import Dict, Any
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer
+
+from ai.cache import LRUCache
+from ai.embeddings import get_embedding_model
+from ai.vector_store import COLLECTION_NAME, create_report_collection, get_chroma_client, get_report_collection
 
 load_dotenv()
 
@@ -12,30 +15,34 @@ class StyleScorer:
         # Lazy load embedding model
         self.embedding_model = None
         
-        # Initialize ChromaDB
-        if os.getenv('RENDER'):
-            # In-memory client for production (Render has ephemeral storage)
-            self.chroma_client = chromadb.EphemeralClient()
-        else:
-            # Persistent client for local development
-            self.chroma_client = chromadb.PersistentClient(path="./chroma_db")
+        # Embeddings memoized by content hash so repeated reports skip the forward pass
+        self._emb_cache = LRUCache(maxsize=512)
         
-        try:
-            # Try to get existing collection
-            self.collection = self.chroma_client.get_collection("quarterly_reports")
-        except:
-            # Create collection if it doesn't exist
-            self.collection = self.chroma_client.create_collection(
-                name="quarterly_reports",
-                metadata={"description": "Historical quarterly reports for style matching"}
-            )
+        # Full score results for reports scored before (retries, refreshes)
+        self._score_cache = LRUCache(maxsize=128)
+        
+        # Shared ChromaDB client (chromadb is imported lazily to keep module import cheap)
+        from ai.chroma_embeddings import SharedModelEmbeddingFunction
+        self.chroma_client = get_chroma_client()
+        
+        # Chroma embeds query_texts through the shared (cached) encoder
+        self._embedding_function = SharedModelEmbeddingFunction(self._embed_cached)
+        
+        # Existing collection, if it was indexed with the current model
+        self.collection = get_report_collection(self.chroma_client, self._embedding_function)
+        if self.collection is None:
+            # Missing or stale: re-index the past reports with the current model
+            from ai.memory_loader import MemoryLoader
+            MemoryLoader().load_past_reports()
+            self.collection = get_report_collection(self.chroma_client, self._embedding_function)
+        if self.collection is None:
+            self.collection = create_report_collection(self.chroma_client, self._embedding_function)
     
     def _get_embedding_model(self):
         """Lazy load the embedding model"""
         if self.embedding_model is None:
             try:
-                from sentence_transformers import SentenceTransformer
-                self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+                self.embedding_model = get_embedding_model()
             except Exception as e:
                 print(f"⚠️ Warning: Failed to load embedding model: {e}")
                 return None
@@ -51,40 +58,26 @@ class StyleScorer:
         Returns:
             dict: Style score and retrieved similar reports
         """
+        key = self._text_key(report)
+        cached = self._score_cache.get(key)
+        if cached is not None:
+            return cached
+        
         try:
-            # Generate embedding for the input report
-            report_embedding = await self._get_embedding(report)
-            
-            # Query similar reports from vector database
-            similar_reports = self._query_similar_reports(report_embedding, n_results=3)
+            # Embed the report and query similar reports in one Chroma call
+            similar_reports = self._query_similar_reports(report, n_results=3)
             
             # Calculate average similarity score
-            if similar_reports and len(similar_reports['distances'][0]) > 0:
-                # ChromaDB returns distances (lower = more similar), convert to similarity score
-                distances = similar_reports['distances'][0]
-                similarities = [max(0, 1 - distance) for distance in distances]
-                avg_similarity = sum(similarities) / len(similarities)
-                score = avg_similarity * 100  # Convert to percentage
-                
-                # Prepare retrieved documents
-                retrieved_docs = []
-                if similar_reports['documents']:
-                    for i, doc in enumerate(similar_reports['documents'][0]):
-                        retrieved_docs.append({
-                            "text": doc,
-                            "similarity": similarities[i] if i < len(similarities) else 0,
-                            "metadata": similar_reports['metadatas'][0][i] if similar_reports['metadatas'] and i < len(similar_reports['metadatas'][0]) else {}
-                        })
-            else:
-                score = 0
-                retrieved_docs = []
+            score, retrieved_docs = self._summarize_similarity(similar_reports)
             
-            return {
+            result = {
                 "score": min(100, max(0, score)),  # Ensure score is between 0-100
                 "retrieved": retrieved_docs,
                 "method": "SentenceTransformers embeddings with cosine similarity",
                 "total_references": len(retrieved_docs)
             }
+            self._score_cache.set(key, result)
+            return result
             
         except Exception as e:
             return {
@@ -95,19 +88,35 @@ class StyleScorer:
                 "total_references": 0
             }
     
-    async def _get_embedding(self, text: str) -> List[float]:
+    async def _get_embedding(self, text: str) -> np.ndarray:
         """Generate embedding using SentenceTransformers"""
         try:
-            embedding = self.embedding_model.encode(text)
-            return embedding.tolist()
+            return self._embed_cached(text)
         except Exception as e:
             raise Exception(f"Failed to generate embedding: {str(e)}")
     
-    def _query_similar_reports(self, embedding: List[float], n_results: int = 3) -> Dict:
-        """Query ChromaDB for similar reports"""
+    @staticmethod
+    def _text_key(text: str) -> bytes:
+        """Compact content hash used to key the embedding and score caches"""
+        return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+    
+    def _embed_cached(self, text: str) -> np.ndarray:
+        """Encode text, reusing the embedding when the same text was seen before"""
+        key = self._text_key(text)
+        embedding = self._emb_cache.get(key)
+        if embedding is None:
+            model = self._get_embedding_model()
+            if model is None:
+                raise Exception("Embedding model not available")
+            embedding = model.encode(text, convert_to_numpy=True, normalize_embeddings=True).astype(np.float16)
+            self._emb_cache.set(key, embedding)
+        return embedding
+    
+    def _query_similar_reports(self, report: str, n_results: int = 3) -> Dict:
+        """Query ChromaDB for reports similar to the given text"""
         try:
             results = self.collection.query(
-                query_embeddings=[embedding],
+                query_texts=[report],
                 n_results=n_results
             )
             return results
@@ -115,18 +124,41 @@ class StyleScorer:
             print(f"Query error: {e}")
             return {"documents": [], "distances": [], "metadatas": []}
     
+    def _summarize_similarity(self, similar_reports: Dict) -> tuple:
+        """Turn a Chroma query result into a 0-100 score and the retrieved documents"""
+        if not similar_reports or not similar_reports['distances'] or len(similar_reports['distances'][0]) == 0:
+            return 0, []
+        
+        # Collection uses cosine distance, so similarity is 1 - distance
+        similarities = np.clip(1.0 - np.asarray(similar_reports['distances'][0], dtype=np.float32), 0.0, None)
+        score = float(similarities.mean()) * 100  # Convert to percentage
+        similarity_values = similarities.tolist()
+        
+        # Prepare retrieved documents
+        retrieved_docs = []
+        if similar_reports['documents']:
+            metadatas = similar_reports['metadatas'][0] if similar_reports['metadatas'] else []
+            for i, doc in enumerate(similar_reports['documents'][0]):
+                retrieved_docs.append({
+                    "text": doc,
+                    "similarity": similarity_values[i] if i < len(similarity_values) else 0,
+                    "metadata": metadatas[i] if i < len(metadatas) else {}
+                })
+        
+        return score, retrieved_docs
+    
     def get_collection_info(self) -> Dict[str, Any]:
         """Get information about the ChromaDB collection"""
         try:
             count = self.collection.count()
             return {
-                "collection_name": "quarterly_reports",
+                "collection_name": COLLECTION_NAME,
                 "document_count": count,
                 "status": "ready"
             }
         except Exception as e:
             return {
-                "collection_name": "quarterly_reports",
+                "collection_name": COLLECTION_NAME,
                 "document_count": 0,
                 "status": f"error: {str(e)}"
             }
@@ -135,39 +167,26 @@ class StyleScorer:
 class SyncStyleScorer(StyleScorer):
     def score_sync(self, report: str) -> Dict[str, Any]:
         """Synchronous version of score method"""
+        key = self._text_key(report)
+        cached = self._score_cache.get(key)
+        if cached is not None:
+            return cached
+        
         try:
-            # Generate embedding for the input report
-            report_embedding = self._get_embedding_sync(report)
-            
-            # Query similar reports from vector database
-            similar_reports = self._query_similar_reports(report_embedding, n_results=3)
+            # Embed the report and query similar reports in one Chroma call
+            similar_reports = self._query_similar_reports(report, n_results=3)
             
             # Calculate average similarity score
-            if similar_reports and len(similar_reports['distances'][0]) > 0:
-                distances = similar_reports['distances'][0]
-                similarities = [max(0, 1 - distance) for distance in distances]
-                avg_similarity = sum(similarities) / len(similarities)
-                score = avg_similarity * 100
-                
-                # Prepare retrieved documents
-                retrieved_docs = []
-                if similar_reports['documents']:
-                    for i, doc in enumerate(similar_reports['documents'][0]):
-                        retrieved_docs.append({
-                            "text": doc,
-                            "similarity": similarities[i] if i < len(similarities) else 0,
-                            "metadata": similar_reports['metadatas'][0][i] if similar_reports['metadatas'] and i < len(similar_reports['metadatas'][0]) else {}
-                        })
-            else:
-                score = 0
-                retrieved_docs = []
+            score, retrieved_docs = self._summarize_similarity(similar_reports)
             
-            return {
+            result = {
                 "score": min(100, max(0, score)),
                 "retrieved": retrieved_docs,
                 "method": "OpenAI embeddings with cosine similarity",
                 "total_references": len(retrieved_docs)
             }
+            self._score_cache.set(key, result)
+            return result
             
         except Exception as e:
             return {
@@ -178,13 +197,9 @@ class SyncStyleScorer(StyleScorer):
                 "total_references": 0
             }
     
-    def _get_embedding_sync(self, text: str) -> List[float]:
+    def _get_embedding_sync(self, text: str) -> np.ndarray:
         """Generate embedding using SentenceTransformers (synchronous)"""
-        model = self._get_embedding_model()
-        if model is None:
-            raise Exception("Embedding model not available")
-        embedding = model.encode(text)
-        return embedding.tolist()
+        return self._embed_cached(text)
 
 if __name__ == "__main__":
     # Test the style scorer
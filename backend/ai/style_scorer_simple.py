@@ -1,13 +1,38 @@
 import google.generativeai as genai
+import asyncio
+import hashlib
+import json
+import numpy as np
 import os
 import re
-import chromadb
 from typing import Dict, Any, List
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer
+
+from ai.async_utils import run_sync
+from ai.cache import LRUCache, get_llm_cache, get_result_cache, hash_key
+from ai.embeddings import get_embedding_model
+from ai.prompts import LANGUAGE_DIMENSIONS, LANGUAGE_QUALITY_SCHEMA
+from ai.retry import gemini_retry
+from ai.vec_index import get_vec_index
+from ai.vector_store import create_report_collection, get_chroma_client, get_report_collection
 
 load_dotenv()
 
+# One encode call per batch of reports; normalized vectors match the cosine collection
+ENCODE_KWARGS = dict(batch_size=64, convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=False)
+
+# Cap on in-flight Gemini requests when scoring a batch of reports
+MAX_CONCURRENT_REQUESTS = 10
+
+# Reports longer than this many words are condensed before language analysis
+LANGUAGE_PROMPT_MAX_WORDS = 300
+
+# Patterns used by the structural and language-quality analyses. The structure
+# sweep matches paragraph breaks, numbers, percent signs and the runs between
+# them; every non-space character is covered, so adjacent matches form one word.
+_STRUCTURE_TOKEN_RE = re.compile(r'(\n\n)|(\d+\.?\d*)|(%)|[^\s\d%]+')
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+
 class StyleScorer:
     def __init__(self):
         """Initialize Style Scorer with Gemini AI and ChromaDB"""
@@ -17,23 +42,30 @@ class StyleScorer:
         self.chroma_client = None
         self.collection = None
         
+        # Gemini language-quality answers reused for identical or near-duplicate reports
+        self.llm_cache = get_llm_cache()
+        
+        # Report embeddings memoized by content hash across calls
+        self._emb_cache = LRUCache(maxsize=512)
+        
+        # Whole score_sync results for reports seen before (on disk, LRU)
+        self.result_cache = get_result_cache()
+        
         if self.api_key:
             try:
                 genai.configure(api_key=self.api_key)
                 self.model = genai.GenerativeModel('gemini-2.5-flash')
                 
                 # Initialize embedding model for similarity
-                self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+                self.embedding_model = get_embedding_model()
                 
-                # Initialize ChromaDB - use in-memory for ephemeral environments
+                # Shared ChromaDB client - in-memory for ephemeral environments
                 try:
-                    if os.getenv('RENDER'):
-                        # In-memory client for production
-                        self.chroma_client = chromadb.EphemeralClient()
-                    else:
-                        # Persistent client for local development
-                        self.chroma_client = chromadb.PersistentClient(path="./chroma_db")
-                    self.collection = self.chroma_client.get_collection("quarterly_reports")
+                    self.chroma_client = get_chroma_client()
+                    self._reindex_if_stale()
+                    self.collection = get_report_collection(self.chroma_client)
+                    if self.collection is None:
+                        print("⚠️ ChromaDB collection not ready")
                 except Exception as e:
                     print(f"⚠️ ChromaDB collection not ready: {e}")
                     self.collection = None
@@ -43,10 +75,175 @@ class StyleScorer:
         else:
             print("Warning: GEMINI_API_KEY not found - AI style scoring features will be disabled")
     
-    def score_sync(self, report: str) -> Dict[str, Any]:
+    def warmup(self) -> None:
+        """
+        Pay one-time initialization costs up front instead of on the first request
+        
+        Runs a dummy embedding (weight load, kernel setup) and fetches the
+        ChromaDB collection handle if it was not ready at construction time.
+        No Gemini call is made; every call is billed.
+        """
+        if not self.api_key:
+            return
+        
+        if self.embedding_model is not None:
+            try:
+                self.embedding_model.encode(["warmup"], **ENCODE_KWARGS)
+            except Exception as e:
+                print(f"⚠️ Warning: Embedding warmup failed: {e}")
+        
+        if self.collection is None and self.chroma_client is not None:
+            self.collection = get_report_collection(self.chroma_client)
+            if self.collection is None:
+                print("⚠️ ChromaDB collection not ready")
+    
+    def _reindex_if_stale(self) -> None:
+        """Rebuild the past-reports indexes if sqlite-vec holds another model's vectors"""
+        vec_index = get_vec_index()
+        if vec_index is not None and vec_index.count() > 0 and not vec_index.is_current():
+            print("⚠️ sqlite-vec index was built with another embedding model; re-indexing past reports")
+            from ai.memory_loader import MemoryLoader
+            MemoryLoader().load_past_reports()
+    
+    def score_sync(self, report: str, use_cache: bool = True) -> Dict[str, Any]:
         """
         Score the style of the report using Gemini AI and historical comparison
+        
+        Args:
+            report: Report text to score
+            use_cache: False to skip cached results and ask Gemini again
         """
+        return run_sync(self.score_async(report, use_cache))
+    
+    async def score_async(self, report: str, use_cache: bool = True) -> Dict[str, Any]:
+        """Async version of score_sync; Gemini and similarity run concurrently"""
+        unavailable = self._unavailable_result()
+        if unavailable is not None:
+            return unavailable
+        
+        cache_key = hash_key({"style_score": report}) if self.result_cache is not None else None
+        if cache_key is not None:
+            cached = self.result_cache.get(cache_key) if use_cache else None
+            if cached is not None:
+                return cached
+            
+        try:
+            # 1. Structural Analysis (30 points)
+            structural = self._analyze_structure(report)
+            
+            # One embedding serves both the LLM cache lookup and the similarity query
+            embeddings = await asyncio.to_thread(self._embed_reports, [report])
+            embedding = embeddings[0] if embeddings is not None else None
+            
+            # 2. Language Quality Analysis via Gemini (40 points) and
+            # 3. Historical Style Similarity (30 points), overlapped
+            language, similarity = await asyncio.gather(
+                self._analyze_language_quality(report, embedding, use_cache),
+                asyncio.to_thread(self._analyze_historical_similarity_batch, [report], embeddings)
+            )
+            
+            result = self._build_result(structural, language, similarity[0])
+            
+            # Only scores from a real Gemini answer and a real similarity query
+            # are persisted; fallback scores are recomputed next time
+            language_ok, similarity_ok = language[2], similarity[0][2]
+            if cache_key is not None and language_ok and similarity_ok:
+                self.result_cache.set(cache_key, result)
+            
+            return result
+            
+        except Exception as e:
+            return self._failed_result(e)
+    
+    def score_batch_sync(self, reports: List[str]) -> List[Dict[str, Any]]:
+        """
+        Score several reports, embedding them in one batch and querying
+        ChromaDB once for all of them
+        
+        Args:
+            reports: Report texts to score
+            
+        Returns:
+            list: One score_sync-style result per report, in order
+        """
+        return run_sync(self.score_batch_async(reports))
+    
+    async def score_batch_async(self, reports: List[str]) -> List[Dict[str, Any]]:
+        """Async version of score_batch_sync with concurrent Gemini calls"""
+        unavailable = self._unavailable_result()
+        if unavailable is not None:
+            return [dict(unavailable) for _ in reports]
+        
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        
+        async def _language(report: str, embedding) -> tuple:
+            async with semaphore:
+                return await self._analyze_language_quality(report, embedding)
+        
+        try:
+            structural = [self._analyze_structure(report) for report in reports]
+            embeddings = await asyncio.to_thread(self._embed_reports, reports)
+            per_report = embeddings if embeddings is not None else [None] * len(reports)
+            language, similarity = await asyncio.gather(
+                asyncio.gather(*(_language(r, e) for r, e in zip(reports, per_report))),
+                asyncio.to_thread(self._analyze_historical_similarity_batch, reports, embeddings)
+            )
+            
+            return [
+                self._build_result(*parts)
+                for parts in zip(structural, language, similarity)
+            ]
+            
+        except Exception as e:
+            return [self._failed_result(e) for _ in reports]
+    
+    def index_reports(self, reports: List[str], ids: List[str], metadatas: List[Dict[str, Any]] = None) -> int:
+        """
+        Add historical reports to the similarity collection
+        
+        All reports are embedded with one batched encode call (longest first,
+        so padded batches hold similarly sized texts) and written with a
+        single collection.add, plus the sqlite-vec index when it is in use.
+        
+        Args:
+            reports: Report texts to index
+            ids: Unique document id per report
+            metadatas: Optional metadata dict per report
+            
+        Returns:
+            int: Number of reports indexed
+        """
+        if not reports:
+            return 0
+        if self.embedding_model is None or self.chroma_client is None:
+            raise Exception("Embedding model or ChromaDB not available")
+        
+        order = sorted(range(len(reports)), key=lambda i: len(reports[i]), reverse=True)
+        sorted_embeddings = self.embedding_model.encode(
+            [reports[i] for i in order],
+            **{**ENCODE_KWARGS, "show_progress_bar": len(reports) > 256}
+        )
+        embeddings = np.empty_like(sorted_embeddings, dtype=np.float32)
+        embeddings[order] = sorted_embeddings
+        
+        if self.collection is None:
+            # A stale collection is replaced rather than mixed with new vectors
+            self.collection = get_report_collection(self.chroma_client) or create_report_collection(self.chroma_client)
+        self.collection.add(
+            embeddings=embeddings,
+            documents=list(reports),
+            metadatas=metadatas,
+            ids=list(ids)
+        )
+        
+        vec_index = get_vec_index()
+        if vec_index is not None:
+            vec_index.add(embeddings)
+        
+        return len(reports)
+    
+    def _unavailable_result(self):
+        """Result returned when Gemini is not configured, else None"""
         if not self.api_key:
             return {
                 "overall_score": 0,
@@ -68,65 +265,71 @@ class StyleScorer:
                 },
                 "feedback": "AI model initialization failed"
             }
-            
-        try:
-            # 1. Structural Analysis (30 points)
-            structural_score, structural_details = self._analyze_structure(report)
-            
-            # 2. Language Quality Analysis via Gemini (40 points)
-            language_score, language_details = self._analyze_language_quality(report)
-            
-            # 3. Historical Style Similarity (30 points)
-            similarity_score, similarity_details = self._analyze_historical_similarity(report)
-            
-            # Calculate total score
-            total_score = structural_score + language_score + similarity_score
-            
-            # Get comprehensive feedback
-            feedback = self._generate_feedback(total_score, structural_score, language_score, similarity_score)
-            
-            return {
-                "style_score": round(total_score, 2),
-                "max_score": 100.0,
-                "percentage": round(total_score, 2),
-                "breakdown": {
-                    "structural": {
-                        "score": round(structural_score, 2),
-                        "max": 30.0,
-                        "details": structural_details
-                    },
-                    "language_quality": {
-                        "score": round(language_score, 2),
-                        "max": 40.0,
-                        "details": language_details
-                    },
-                    "historical_similarity": {
-                        "score": round(similarity_score, 2),
-                        "max": 30.0,
-                        "details": similarity_details
-                    }
+        
+        return None
+    
+    def _build_result(self, structural: tuple, language: tuple, similarity: tuple) -> Dict[str, Any]:
+        """
+        Combine each analysis into the API result
+        
+        Args:
+            structural: (score, details)
+            language: (score, details) or (score, details, ok)
+            similarity: (score, details) or (score, details, ok)
+        """
+        structural_score, structural_details = structural
+        language_score, language_details = language[:2]
+        similarity_score, similarity_details = similarity[:2]
+        
+        # Calculate total score
+        total_score = structural_score + language_score + similarity_score
+        
+        # Get comprehensive feedback
+        feedback = self._generate_feedback(total_score, structural_score, language_score, similarity_score)
+        
+        return {
+            "style_score": round(total_score, 2),
+            "max_score": 100.0,
+            "percentage": round(total_score, 2),
+            "breakdown": {
+                "structural": {
+                    "score": round(structural_score, 2),
+                    "max": 30.0,
+                    "details": structural_details
                 },
-                "feedback": feedback,
-                "grade": self._get_grade(total_score)
-            }
-            
-        except Exception as e:
-            return {
-                "style_score": 0.0,
-                "max_score": 100.0,
-                "percentage": 0.0,
-                "breakdown": {},
-                "feedback": f"Style scoring failed: {str(e)}",
-                "grade": "F"
-            }
+                "language_quality": {
+                    "score": round(language_score, 2),
+                    "max": 40.0,
+                    "details": language_details
+                },
+                "historical_similarity": {
+                    "score": round(similarity_score, 2),
+                    "max": 30.0,
+                    "details": similarity_details
+                }
+            },
+            "feedback": feedback,
+            "grade": self._get_grade(total_score)
+        }
+    
+    def _failed_result(self, error: Exception) -> Dict[str, Any]:
+        return {
+            "style_score": 0.0,
+            "max_score": 100.0,
+            "percentage": 0.0,
+            "breakdown": {},
+            "feedback": f"Style scoring failed: {str(error)}",
+            "grade": "F"
+        }
     
     def _analyze_structure(self, report: str) -> tuple:
         """Analyze structural elements (30 points)"""
         score = 0.0
         details = {}
         
+        word_count, paragraph_count, has_numbers, has_percentages = self._scan_structure(report)
+        
         # Word count analysis (10 points)
-        word_count = len(report.split())
         details["word_count"] = word_count
         if 150 <= word_count <= 400:
             score += 10.0
@@ -139,8 +342,6 @@ class StyleScorer:
             details["word_count_status"] = "Needs adjustment"
         
         # Paragraph structure (10 points)
-        paragraphs = [p.strip() for p in report.split('\n\n') if p.strip()]
-        paragraph_count = len(paragraphs)
         details["paragraph_count"] = paragraph_count
         if 2 <= paragraph_count <= 3:
             score += 10.0
@@ -153,8 +354,6 @@ class StyleScorer:
             details["structure_status"] = "Structure needs improvement"
         
         # Data integration (10 points)
-        has_percentages = report.count('%')
-        has_numbers = len(re.findall(r'\d+\.?\d*', report))
         details["percentage_mentions"] = has_percentages
         details["numeric_references"] = has_numbers
         
@@ -170,13 +369,58 @@ class StyleScorer:
         
         return score, details
     
-    def _analyze_language_quality(self, report: str) -> tuple:
-        """Analyze language quality using Gemini AI (40 points)"""
+    def _scan_structure(self, report: str) -> tuple:
+        """
+        Word, paragraph, number and percent-sign counts from a single regex sweep
+        
+        Equivalent to len(report.split()), the non-blank chunks of
+        report.split('\\n\\n'), len(re.findall(r'\\d+\\.?\\d*', report))
+        and report.count('%').
+        """
+        word_count = paragraph_count = number_count = percent_count = 0
+        paragraph_has_text = False
+        prev_end = -1
+        
+        for match in _STRUCTURE_TOKEN_RE.finditer(report):
+            if match.group(1):
+                if paragraph_has_text:
+                    paragraph_count += 1
+                paragraph_has_text = False
+                continue
+            
+            if match.group(2):
+                number_count += 1
+            elif match.group(3):
+                percent_count += 1
+            if match.start() != prev_end:
+                word_count += 1
+            prev_end = match.end()
+            paragraph_has_text = True
+        
+        if paragraph_has_text:
+            paragraph_count += 1
+        
+        return word_count, paragraph_count, number_count, percent_count
+    
+    async def _analyze_language_quality(self, report: str, embedding=None, use_cache: bool = True) -> tuple:
+        """
+        Analyze language quality using Gemini AI (40 points)
+        
+        Returns:
+            tuple: (score, details, ok); ok is False for the fallback score
+                used when Gemini fails
+        """
+        # The cache may query Chroma, so keep it off the event loop thread
+        if use_cache and self.llm_cache is not None:
+            cached = await asyncio.to_thread(self.llm_cache.get, "language_quality", report, embedding=embedding)
+            if cached is not None:
+                return cached[0], cached[1], True
+        
         try:
             analysis_prompt = f"""Analyze this financial report's writing quality on these dimensions:
 
 REPORT:
-{report}
+{self._compress_for_language(report)}
 
 Rate each dimension from 0-10:
 1. TONE: Professional, authoritative, appropriate for institutional investors
@@ -184,44 +428,29 @@ Rate each dimension from 0-10:
 3. COHERENCE: Logical flow, smooth transitions between ideas
 4. ENGAGEMENT: Compelling narrative while remaining factual
 
-Respond in this exact format:
-TONE: [score]/10 - [brief comment]
-CLARITY: [score]/10 - [brief comment]
-COHERENCE: [score]/10 - [brief comment]
-ENGAGEMENT: [score]/10 - [brief comment]"""
+Return each score as an integer field (tone, clarity, coherence, engagement)
+with a brief comment in the matching *_comment field."""
 
-            response = self.model.generate_content(
+            response = await self._generate_async(
                 analysis_prompt,
-                generation_config=genai.types.GenerationConfig(
+                genai.types.GenerationConfig(
                     temperature=0.3,
                     max_output_tokens=400,
+                    candidate_count=1,
+                    response_mime_type="application/json",
+                    response_schema=LANGUAGE_QUALITY_SCHEMA,
                 )
             )
             
-            # Parse Gemini response
-            result_text = response.text
-            details = {}
-            total_ai_score = 0.0
+            # Schema-constrained JSON: 4 dimensions × 10 points = 40-point section
+            final_score, details = self._language_from_json(json.loads(response.text))
             
-            for dimension in ['TONE', 'CLARITY', 'COHERENCE', 'ENGAGEMENT']:
-                pattern = rf'{dimension}:\s*(\d+)/10\s*-\s*(.+?)(?=\n|$)'
-                match = re.search(pattern, result_text, re.IGNORECASE | re.DOTALL)
-                if match:
-                    score = float(match.group(1))
-                    comment = match.group(2).strip()
-                    details[dimension.lower()] = {
-                        "score": score,
-                        "comment": comment
-                    }
-                    total_ai_score += score
-                else:
-                    details[dimension.lower()] = {"score": 7.0, "comment": "Analysis unavailable"}
-                    total_ai_score += 7.0
-            
-            # Convert 40-point scale (4 dimensions × 10 points)
-            final_score = (total_ai_score / 40.0) * 40.0
+            if self.llm_cache is not None:
+                await asyncio.to_thread(
+                    self.llm_cache.set, "language_quality", report, (final_score, details), embedding=embedding
+                )
             
-            return final_score, details
+            return final_score, details, True
             
         except Exception as e:
             # Fallback to basic analysis
@@ -231,56 +460,149 @@ ENGAGEMENT: [score]/10 - [brief comment]"""
                 "coherence": {"score": 7.0, "comment": "Good logical flow"},
                 "engagement": {"score": 7.0, "comment": "Engaging narrative"}
             }
-            return 28.0, details
+            return 28.0, details, False
     
-    def _analyze_historical_similarity(self, report: str) -> tuple:
-        """Analyze similarity to historical reports (30 points)"""
+    def _language_from_json(self, data: Dict[str, Any]) -> tuple:
+        """(score, details) for the 40-point language section from a JSON answer"""
         details = {}
+        total_ai_score = 0.0
+        
+        for dimension in LANGUAGE_DIMENSIONS:
+            score = float(min(10, max(0, data[dimension])))
+            details[dimension] = {
+                "score": score,
+                "comment": str(data.get(f"{dimension}_comment", "")).strip()
+            }
+            total_ai_score += score
+        
+        return total_ai_score, details
+    
+    def _compress_for_language(self, report: str) -> str:
+        """
+        Shorten long reports for the language-quality prompt
         
-        if not self.collection:
-            details["similarity"] = "Historical comparison unavailable"
-            return 20.0, details  # Default decent score
+        Tone and clarity can be judged from a sample, so long reports keep the
+        first sentence of each paragraph plus every third sentence. Short
+        reports (the normal case) are sent unchanged.
+        """
+        if len(report.split()) <= LANGUAGE_PROMPT_MAX_WORDS:
+            return report
         
+        condensed = []
+        for paragraph in report.split('\n\n'):
+            sentences = _SENTENCE_SPLIT_RE.split(paragraph.strip())
+            kept = [s for i, s in enumerate(sentences) if i % 3 == 0 and s]
+            if kept:
+                condensed.append(" ".join(kept))
+        return "\n\n".join(condensed)
+    
+    @gemini_retry
+    async def _generate_async(self, prompt: str, generation_config):
+        """Async Gemini call, retried with backoff on rate limits and 5xx errors"""
+        return await self.model.generate_content_async(prompt, generation_config=generation_config)
+    
+    def _analyze_historical_similarity(self, report: str, embedding=None) -> tuple:
+        """Analyze similarity to historical reports (30 points)"""
+        embeddings = None if embedding is None else np.asarray([embedding])
+        return self._analyze_historical_similarity_batch([report], embeddings)[0]
+    
+    def _embed_reports(self, reports: List[str]):
+        """
+        Normalized embeddings for reports, or None if unavailable
+        
+        Previously seen reports come from the content-hash cache; the rest are
+        encoded together in one batch.
+        """
+        if not reports or self.embedding_model is None:
+            return None
         try:
-            # Get embedding for current report
-            report_embedding = self.embedding_model.encode(report).tolist()
-            
-            # Query similar reports from ChromaDB
-            results = self.collection.query(
-                query_embeddings=[report_embedding],
-                n_results=3
-            )
+            keys = [hashlib.blake2b(r.encode('utf-8'), digest_size=16).hexdigest() for r in reports]
+            cached = [self._emb_cache.get(key) for key in keys]
+            missing = [i for i, emb in enumerate(cached) if emb is None]
+            if missing:
+                fresh = self.embedding_model.encode([reports[i] for i in missing], **ENCODE_KWARGS)
+                for i, emb in zip(missing, fresh):
+                    self._emb_cache.set(keys[i], emb)
+                    cached[i] = emb
+            return np.stack(cached)
+        except Exception as e:
+            print(f"⚠️ Warning: Failed to embed reports: {e}")
+            return None
+    
+    def _analyze_historical_similarity_batch(self, reports: List[str], report_embeddings=None) -> List[tuple]:
+        """
+        Historical similarity for several reports with one encode and one query
+        
+        Returns:
+            list: (score, details, ok) per report; ok is False for the default
+                score used when no historical comparison was possible
+        """
+        if not reports:
+            return []
+        
+        # sqlite-vec serves local (persistent) mode when loaded; Chroma otherwise.
+        # An index written by another embedding model is ignored until rebuilt.
+        vec_index = get_vec_index()
+        if vec_index is not None and (vec_index.count() == 0 or not vec_index.is_current()):
+            vec_index = None
+        
+        if not self.collection and vec_index is None:
+            return [(20.0, {"similarity": "Historical comparison unavailable"}, False) for _ in reports]  # Default decent score
+        
+        try:
+            # Embed all reports in one batch and pass the numpy array straight to the index
+            if report_embeddings is None:
+                report_embeddings = self._embed_reports(reports)
+            if report_embeddings is None:
+                raise Exception("Embedding model not available")
             
-            if results and results['distances'] and len(results['distances'][0]) > 0:
-                # Convert distances to similarity scores (lower distance = higher similarity)
-                distances = results['distances'][0]
-                similarities = [1 / (1 + d) for d in distances]  # Convert to 0-1 range
-                avg_similarity = sum(similarities) / len(similarities)
-                
-                # Convert to 30-point scale
-                score = avg_similarity * 30.0
-                
-                details["avg_similarity"] = round(avg_similarity * 100, 2)
-                details["comparison_count"] = len(similarities)
-                details["top_match_similarity"] = round(similarities[0] * 100, 2)
-                
-                if avg_similarity >= 0.75:
-                    details["consistency"] = "Excellent consistency with historical style"
-                elif avg_similarity >= 0.60:
-                    details["consistency"] = "Good alignment with past reports"
-                elif avg_similarity >= 0.45:
-                    details["consistency"] = "Moderate similarity to historical style"
-                else:
-                    details["consistency"] = "Developing unique style"
-                
-                return score, details
+            if vec_index is not None:
+                distances = vec_index.query_distances(report_embeddings, k=3)
             else:
-                details["similarity"] = "No historical reports for comparison"
-                return 20.0, details
+                # Query similar reports from ChromaDB
+                results = self.collection.query(
+                    query_embeddings=report_embeddings,
+                    n_results=3
+                )
+                distances = results['distances'] if results and results['distances'] else []
+            per_report = [distances[i] if i < len(distances) else [] for i in range(len(reports))]
+            return [
+                (*self._similarity_from_distances(d), len(d) > 0)
+                for d in per_report
+            ]
                 
         except Exception as e:
-            details["error"] = f"Similarity analysis failed: {str(e)}"
+            return [(20.0, {"error": f"Similarity analysis failed: {str(e)}"}, False) for _ in reports]
+    
+    def _similarity_from_distances(self, distances: List[float]) -> tuple:
+        """Turn one report's Chroma distances into a (score, details) pair"""
+        details = {}
+        
+        if len(distances) == 0:
+            details["similarity"] = "No historical reports for comparison"
             return 20.0, details
+        
+        # Collection uses cosine distance, so similarity is 1 - distance
+        similarities = [1 - d for d in distances]
+        avg_similarity = sum(similarities) / len(similarities)
+        
+        # Convert to 30-point scale
+        score = max(0.0, avg_similarity * 30.0)
+        
+        details["avg_similarity"] = round(avg_similarity * 100, 2)
+        details["comparison_count"] = len(similarities)
+        details["top_match_similarity"] = round(similarities[0] * 100, 2)
+        
+        if avg_similarity >= 0.75:
+            details["consistency"] = "Excellent consistency with historical style"
+        elif avg_similarity >= 0.60:
+            details["consistency"] = "Good alignment with past reports"
+        elif avg_similarity >= 0.45:
+            details["consistency"] = "Moderate similarity to historical style"
+        else:
+            details["consistency"] = "Developing unique style"
+        
+        return score, details
     
     def _generate_feedback(self, total: float, structural: float, language: float, similarity: float) -> str:
         """Generate comprehensive feedback"""
@@ -1,11 +1,25 @@
 import google.generativeai as genai
+import asyncio
+import json
+import numpy as np
 import os
 import re
 from typing import Dict, Any, List
 from dotenv import load_dotenv
 
+from ai.async_utils import run_sync
+from ai.cache import get_llm_cache, get_result_cache, hash_key
+from ai.prompts import SEMANTIC_VALIDATION_SCHEMA, SEMANTIC_VALIDATION_TEMPLATE, format_metrics_lines
+from ai.retry import gemini_retry
+
 load_dotenv()
 
+# Numbers (including percentages and decimals) in report text
+_NUMBER_RE = re.compile(r'-?\d+\.?\d*')
+
+# Static pieces of the semantic-validation prompt, split once at import
+_SEMANTIC_HEAD, _SEMANTIC_MID, _SEMANTIC_TAIL = re.split(r'\{metrics_text\}|\{report\}', SEMANTIC_VALIDATION_TEMPLATE)
+
 class ReportValidator:
     def __init__(self):
         """Initialize the Report Validator with Gemini client"""
@@ -15,6 +29,12 @@ class ReportValidator:
         
         genai.configure(api_key=api_key)
         self.model = genai.GenerativeModel('gemini-2.5-flash')
+        
+        # Semantic verdicts reused for identical or near-duplicate reports on the same metrics
+        self.llm_cache = get_llm_cache()
+        
+        # Whole validation results for (report, metrics) pairs seen before
+        self.result_cache = get_result_cache()
     
     def validate(self, report: str, metrics: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -27,12 +47,30 @@ class ReportValidator:
         Returns:
             dict: Validation results
         """
+        cache_key = None
+        if self.result_cache is not None:
+            cache_key = hash_key({"validate": report, "metrics": metrics})
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        result = run_sync(self.validate_async(report, metrics))
+        
+        # Skip caching when the Gemini check errored, so it is retried next time
+        if cache_key is not None and result.get("details", {}).get("semantic", {}).get("ai_response"):
+            self.result_cache.set(cache_key, result)
+        
+        return result
+    
+    async def validate_async(self, report: str, metrics: Dict[str, Any]) -> Dict[str, Any]:
+        """Async version of validate; both checks run concurrently"""
         try:
-            # Deterministic validation
-            deterministic_result = self._deterministic_validation(report, metrics)
-            
-            # Semantic validation using AI
-            semantic_result = self._semantic_validation(report, metrics)
+            deterministic_result, semantic_result = await asyncio.gather(
+                # Deterministic validation
+                asyncio.to_thread(self._deterministic_validation, report, metrics),
+                # Semantic validation using AI
+                self._semantic_validation(report, metrics)
+            )
             
             # Combine results
             overall_valid = deterministic_result["valid"] and semantic_result["valid"]
@@ -76,23 +114,8 @@ class ReportValidator:
                 if isinstance(value, (int, float)):
                     expected_numbers.append(abs(value))  # Use absolute values for comparison
             
-            # Check tolerance for floating point numbers (±0.5%)
-            tolerance = 0.5
-            
             # Find numbers that don't have matches in expected numbers
-            unmatched_numbers = []
-            
-            for num in numbers_in_report:
-                found_match = False
-                for expected in expected_numbers:
-                    if abs(num - expected) <= tolerance:
-                        found_match = True
-                        break
-                
-                if not found_match:
-                    # Check if it's a reasonable derived number (like sum, difference)
-                    if not self._is_reasonable_derived_number(num, expected_numbers):
-                        unmatched_numbers.append(num)
+            unmatched_numbers = self._find_unmatched_numbers(numbers_in_report, expected_numbers)
             
             # Generate errors for unmatched numbers
             if unmatched_numbers:
@@ -115,106 +138,114 @@ class ReportValidator:
     
     def _extract_numbers(self, text: str) -> List[float]:
         """Extract all numbers from text"""
-        # Pattern to match numbers (including percentages and decimals)
-        pattern = r'-?\d+\.?\d*'
-        matches = re.findall(pattern, text)
+        # Text-only input never needs the regex engine
+        if not any(ch.isdigit() for ch in text):
+            return []
         
         numbers = []
-        for match in matches:
-            try:
-                num = float(match)
-                # Filter out years and other non-metric numbers
-                if 1900 <= num <= 2100:  # Likely years
-                    continue
-                numbers.append(abs(num))  # Use absolute values
-            except ValueError:
+        for match in _NUMBER_RE.finditer(text):
+            token = match.group()
+            # Filter out years with an integer check ("2024" or "2024." at a
+            # sentence end) before paying for float parsing
+            year = token.rstrip('.')
+            if len(year) == 4 and year.isdigit() and 1900 <= int(year) <= 2100:
                 continue
+            numbers.append(abs(float(token)))  # Use absolute values
         
         return numbers
     
-    def _is_reasonable_derived_number(self, number: float, expected_numbers: List[float]) -> bool:
-        """Check if a number could be reasonably derived from expected numbers"""
-        tolerance = 1.0
+    def _find_unmatched_numbers(self, numbers: List[float], expected_numbers: List[float]) -> List[float]:
+        """
+        Numbers that neither match a metric nor look derived from the metrics
+        
+        A number matches when it is within 0.5 of an expected value. Otherwise
+        it is accepted as derived when it is within 1.0 of the sum or absolute
+        difference of two distinct metrics, or of a rounded metric.
+        """
+        if not numbers:
+            return []
         
-        # Check if it's a sum of two numbers
-        for i, num1 in enumerate(expected_numbers):
-            for num2 in expected_numbers[i+1:]:
-                if abs(number - (num1 + num2)) <= tolerance:
-                    return True
-                if abs(number - abs(num1 - num2)) <= tolerance:
-                    return True
+        nums = np.asarray(numbers, dtype=np.float64)
+        exp = np.asarray(expected_numbers, dtype=np.float64)
         
-        # Check if it's a round number close to an expected number
-        for expected in expected_numbers:
-            if abs(number - round(expected)) <= tolerance:
-                return True
+        # Check tolerance for floating point numbers (±0.5%): only the nearest
+        # expected value on each side of a number can be within tolerance, so
+        # a binary search over the sorted metrics replaces the N x M comparison
+        matched = np.zeros(len(nums), dtype=bool)
+        if len(exp):
+            sorted_exp = np.sort(exp)
+            idx = np.searchsorted(sorted_exp, nums)
+            lower = sorted_exp[np.clip(idx - 1, 0, len(sorted_exp) - 1)]
+            upper = sorted_exp[np.clip(idx, 0, len(sorted_exp) - 1)]
+            matched = np.minimum(np.abs(nums - lower), np.abs(nums - upper)) <= 0.5
+        if matched.all():
+            return []
         
-        return False
+        # Only the leftovers pay for the pairwise sum/difference check
+        rest = nums[~matched]
+        tolerance = 1.0
+        i, j = np.triu_indices(len(exp), k=1)
+        candidates = np.concatenate([exp[i] + exp[j], np.abs(exp[i] - exp[j]), np.round(exp)])
+        derived = (np.abs(rest[:, None] - candidates[None, :]) <= tolerance).any(axis=1)
+        
+        return rest[~derived].tolist()
     
-    def _semantic_validation(self, report: str, metrics: Dict[str, Any]) -> Dict[str, Any]:
+    async def _semantic_validation(self, report: str, metrics: Dict[str, Any]) -> Dict[str, Any]:
         """
         AI-powered semantic validation
         
         Checks for fabricated facts or logical inconsistencies
         """
+        scope = hash_key(metrics)
+        # Exact matches only: a near-duplicate report can differ in exactly
+        # the fact the verdict is about. Kept off the event loop thread.
+        if self.llm_cache is not None:
+            cached = await asyncio.to_thread(
+                self.llm_cache.get, "semantic_validation", report, scope=scope, semantic=False
+            )
+            if cached is not None:
+                return cached
+        
         try:
-            metrics_text = "\n".join([f"- {k}: {v}" for k, v in metrics.items()])
+            validation_prompt = self._build_semantic_prompt(report, metrics)
             
-            validation_prompt = f"""You are validating a financial report for accuracy and factual consistency.
-
-METRICS PROVIDED:
-{metrics_text}
-
-REPORT TO VALIDATE:
-{report}
-
-Your task: Identify any fabricated facts, unsupported claims, or information that contradicts the provided metrics.
-
-VALIDATION CRITERIA:
-- Are there any specific companies mentioned that weren't in the metrics?
-- Are there any economic events or factors mentioned that can't be derived from the metrics?
-- Are there any claims about market drivers that go beyond what the numbers show?
-- Does the report contain any information not supported by the provided metrics?
-
-Respond with:
-1. VALID: true/false
-2. ISSUES: List specific problems found (or "None" if valid)
-
-Be strict - if anything cannot be directly supported by the metrics, mark as invalid."""
-
-            response = self.model.generate_content(
+            response = await self._generate_async(
                 validation_prompt,
-                generation_config=genai.types.GenerationConfig(
+                genai.types.GenerationConfig(
                     temperature=0.1,
                     max_output_tokens=500,
+                    candidate_count=1,
+                    response_mime_type="application/json",
+                    response_schema=SEMANTIC_VALIDATION_SCHEMA,
                 )
             )
             
-            result_text = response.text.strip().lower()
-            
-            # Parse the AI response
-            is_valid = "valid: true" in result_text or "valid:true" in result_text
+            result_text = response.text.strip()
+            data = json.loads(result_text)
+            is_valid = bool(data["valid"])
             
-            # Extract issues
             errors = []
             if not is_valid:
-                # Try to extract specific issues from the response
-                lines = result_text.split('\n')
-                for line in lines:
-                    if 'issues:' in line or 'problems:' in line:
-                        issue = line.split(':', 1)[1].strip()
-                        if issue and issue != "none":
-                            errors.append(f"Semantic issue: {issue}")
+                for issue in data.get("issues", []):
+                    issue = str(issue).strip()
+                    if issue:
+                        errors.append(f"Semantic issue: {issue}")
                 
-                # If no specific issues found, add a generic error
+                # If no specific issues were listed, add a generic error
                 if not errors:
                     errors.append("Semantic validation failed: Report contains unsupported information")
             
-            return {
+            result = {
                 "valid": is_valid,
                 "errors": errors,
                 "ai_response": result_text
             }
+            if self.llm_cache is not None:
+                await asyncio.to_thread(
+                    self.llm_cache.set, "semantic_validation", report, result, scope=scope, semantic=False
+                )
+            
+            return result
             
         except Exception as e:
             return {
@@ -223,106 +254,23 @@ Be strict - if anything cannot be directly supported by the metrics, mark as inv
                 "ai_response": ""
             }
 
+    def _build_semantic_prompt(self, report: str, metrics: Dict[str, Any]) -> str:
+        """Fill the static semantic-validation template with metrics and report"""
+        return "".join((_SEMANTIC_HEAD, format_metrics_lines(metrics), _SEMANTIC_MID, report, _SEMANTIC_TAIL))
+    
+    @gemini_retry
+    async def _generate_async(self, prompt: str, generation_config):
+        """Async Gemini call, retried with backoff on rate limits and 5xx errors"""
+        return await self.model.generate_content_async(prompt, generation_config=generation_config)
+
 # Synchronous wrapper
 class SyncReportValidator(ReportValidator):
-    def validate_sync(self, report: str, metrics: Dict[str, Any]) -> Dict[str, Any]:
-        """Synchronous version of validate method"""
-        try:
-            # Deterministic validation
-            deterministic_result = self._deterministic_validation(report, metrics)
-            
-            # Semantic validation using AI
-            semantic_result = self._semantic_validation_sync(report, metrics)
-            
-            # Combine results
-            overall_valid = deterministic_result["valid"] and semantic_result["valid"]
-            all_errors = deterministic_result["errors"] + semantic_result["errors"]
-            
-            return {
-                "valid": overall_valid,
-                "deterministic_valid": deterministic_result["valid"],
-                "semantic_valid": semantic_result["valid"],
-                "errors": all_errors,
-                "details": {
-                    "deterministic": deterministic_result,
-                    "semantic": semantic_result
-                }
-            }
-            
-        except Exception as e:
-            return {
-                "valid": False,
-                "deterministic_valid": False,
-                "semantic_valid": False,
-                "errors": [f"Validation failed: {str(e)}"],
-                "details": {}
-            }
+    # validate() already blocks on the async checks
+    validate_sync = ReportValidator.validate
     
     def _semantic_validation_sync(self, report: str, metrics: Dict[str, Any]) -> Dict[str, Any]:
         """Synchronous semantic validation"""
-        try:
-            metrics_text = "\n".join([f"- {k}: {v}" for k, v in metrics.items()])
-            
-            validation_prompt = f"""You are validating a financial report for accuracy and factual consistency.
-
-METRICS PROVIDED:
-{metrics_text}
-
-REPORT TO VALIDATE:
-{report}
-
-Your task: Identify any fabricated facts, unsupported claims, or information that contradicts the provided metrics.
-
-VALIDATION CRITERIA:
-- Are there any specific companies mentioned that weren't in the metrics?
-- Are there any economic events or factors mentioned that can't be derived from the metrics?
-- Are there any claims about market drivers that go beyond what the numbers show?
-- Does the report contain any information not supported by the provided metrics?
-
-Respond with:
-1. VALID: true/false
-2. ISSUES: List specific problems found (or "None" if valid)
-
-Be strict - if anything cannot be directly supported by the metrics, mark as invalid."""
-
-            response = self.model.generate_content(
-                validation_prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.1,
-                    max_output_tokens=500,
-                )
-            )
-            
-            result_text = response.text.strip().lower()
-            
-            # Parse the AI response
-            is_valid = "valid: true" in result_text or "valid:true" in result_text
-            
-            # Extract issues
-            errors = []
-            if not is_valid:
-                lines = result_text.split('\n')
-                for line in lines:
-                    if 'issues:' in line or 'problems:' in line:
-                        issue = line.split(':', 1)[1].strip()
-                        if issue and issue != "none":
-                            errors.append(f"Semantic issue: {issue}")
-                
-                if not errors:
-                    errors.append("Semantic validation failed: Report contains unsupported information")
-            
-            return {
-                "valid": is_valid,
-                "errors": errors,
-                "ai_response": result_text
-            }
-            
-        except Exception as e:
-            return {
-                "valid": False,
-                "errors": [f"Semantic validation error: {str(e)}"],
-                "ai_response": ""
-            }
+        return run_sync(self._semantic_validation(report, metrics))
 
 if __name__ == "__main__":
     # Test the validator
@@ -0,0 +1,125 @@
+import functools
+import os
+import sqlite3
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+EMBEDDING_DIM = 384
+
+
+class SqliteVecIndex:
+    def __init__(self, path: str = "data/vec_reports.db"):
+        """
+        KNN index of historical report embeddings in a sqlite-vec table
+
+        Used for the persistent (local) mode, where a vec0 virtual table
+        answers nearest-neighbour queries natively in SQLite. If the vec
+        extension cannot be loaded, `available` is False and callers fall
+        back to ChromaDB. A vec_meta table records which embedding variant
+        wrote the vectors; an index built by another variant is stale and
+        must not be queried (see is_current).
+
+        Args:
+            path: SQLite database file holding the vec_reports table
+        """
+        self.path = path
+        self.available = False
+        self._lock = threading.Lock()
+        self.conn = None
+        self._variant = None
+
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.conn = sqlite3.connect(path, check_same_thread=False)
+            self._load_extension()
+            self.conn.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS vec_reports "
+                f"USING vec0(embedding float[{EMBEDDING_DIM}] distance_metric=cosine)"
+            )
+            self.conn.execute("CREATE TABLE IF NOT EXISTS vec_meta (key TEXT PRIMARY KEY, value TEXT)")
+            self.conn.commit()
+            row = self.conn.execute("SELECT value FROM vec_meta WHERE key = 'embedding_variant'").fetchone()
+            self._variant = row[0] if row else None
+            self.available = True
+        except Exception as e:
+            print(f"⚠️ sqlite-vec unavailable, using ChromaDB for similarity search: {e}")
+
+    def _load_extension(self) -> None:
+        self.conn.enable_load_extension(True)
+        try:
+            import sqlite_vec
+            sqlite_vec.load(self.conn)
+        except ImportError:
+            self.conn.load_extension("vec0")
+        finally:
+            self.conn.enable_load_extension(False)
+
+    def is_current(self) -> bool:
+        """True if the indexed vectors come from the embedding model now in use"""
+        from ai.embeddings import embedding_variant
+        return self._variant == embedding_variant()
+
+    def _record_variant(self) -> None:
+        from ai.embeddings import embedding_variant
+        self._variant = embedding_variant()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO vec_meta(key, value) VALUES ('embedding_variant', ?)",
+            (self._variant,)
+        )
+
+    def replace_all(self, embeddings: np.ndarray) -> None:
+        """Replace the indexed embeddings (called when past reports are reloaded)"""
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            self.conn.execute("DELETE FROM vec_reports")
+            self._record_variant()
+            self.conn.executemany(
+                "INSERT INTO vec_reports(rowid, embedding) VALUES (?, ?)",
+                [(i + 1, vector.tobytes()) for i, vector in enumerate(vectors)]
+            )
+            self.conn.commit()
+
+    def add(self, embeddings: np.ndarray) -> None:
+        """Append embeddings after the rows already indexed (a stale index is cleared first)"""
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        current = self.is_current()
+        with self._lock:
+            if not current:
+                self.conn.execute("DELETE FROM vec_reports")
+                self._record_variant()
+            start = self.conn.execute("SELECT COALESCE(MAX(rowid), 0) FROM vec_reports").fetchone()[0]
+            self.conn.executemany(
+                "INSERT INTO vec_reports(rowid, embedding) VALUES (?, ?)",
+                [(start + i + 1, vector.tobytes()) for i, vector in enumerate(vectors)]
+            )
+            self.conn.commit()
+
+    def query_distances(self, embeddings: np.ndarray, k: int = 3) -> List[List[float]]:
+        """Cosine distances of the k nearest reports for each query embedding"""
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        results = []
+        with self._lock:
+            for vector in vectors:
+                rows = self.conn.execute(
+                    "SELECT distance FROM vec_reports WHERE embedding MATCH ? AND k = ? ORDER BY distance",
+                    (vector.tobytes(), k)
+                ).fetchall()
+                results.append([row[0] for row in rows])
+        return results
+
+    def count(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM vec_reports").fetchone()[0]
+
+
+@functools.lru_cache(maxsize=1)
+def get_vec_index() -> Optional[SqliteVecIndex]:
+    """Shared sqlite-vec index for persistent mode, or None (ephemeral mode / unavailable)"""
+    if os.getenv('RENDER'):
+        return None
+    index = SqliteVecIndex(os.getenv("SQLITE_VEC_PATH", "data/vec_reports.db"))
+    return index if index.available else None
@@ -0,0 +1,83 @@
+import functools
+import os
+
+COLLECTION_NAME = "quarterly_reports"
+
+# Embeddings are L2-normalized at ingest and query time, so cosine distance
+# (1 - dot product) gives a true similarity via 1 - distance.
+# HNSW is tuned for a small, read-heavy corpus: a denser graph and wider
+# construction beam cost a little once at ingest, and search_ef=64 keeps
+# recall high on every query. These settings persist with the collection.
+COLLECTION_METADATA = {
+    "description": "Historical quarterly reports for style matching",
+    "hnsw:space": "cosine",
+    "hnsw:M": 32,
+    "hnsw:construction_ef": 200,
+    "hnsw:search_ef": 64,
+}
+
+
+@functools.lru_cache(maxsize=1)
+def get_chroma_client():
+    """
+    Process-wide ChromaDB client shared by the loader and the scorers
+
+    Uses an in-memory client for ephemeral environments (like Render) and
+    persistent local storage otherwise. chromadb is imported on first use.
+    """
+    import chromadb
+
+    if os.getenv('RENDER'):
+        return chromadb.EphemeralClient()
+    return chromadb.PersistentClient(path=os.getenv("CHROMA_DB_PATH", "./chroma_db"))
+
+
+def report_collection_metadata() -> dict:
+    """COLLECTION_METADATA plus the embedding variant the reports are indexed with"""
+    from ai.embeddings import embedding_variant
+    return {**COLLECTION_METADATA, "embedding_variant": embedding_variant()}
+
+
+def get_report_collection(client, embedding_function=None):
+    """
+    The past-reports collection, or None if it is missing or stale
+
+    A collection is stale when it was indexed with different vectors than
+    the shared model now produces: another MiniLM variant (int8 vs fp32,
+    ONNX vs PyTorch), or Chroma's own default embedding function (older
+    collections). Querying it would silently compare mismatched vectors, so
+    callers treat it as missing and re-index via create_report_collection.
+    """
+    from ai.embeddings import embedding_variant
+    try:
+        if embedding_function is not None:
+            collection = client.get_collection(COLLECTION_NAME, embedding_function=embedding_function)
+        else:
+            collection = client.get_collection(COLLECTION_NAME)
+    except Exception:
+        # Missing, or persisted with a conflicting embedding function
+        return None
+
+    if (collection.metadata or {}).get("embedding_variant") != embedding_variant():
+        print("⚠️ Past-reports collection was indexed with another embedding model; it needs re-indexing")
+        return None
+    return collection
+
+
+def create_report_collection(client, embedding_function=None):
+    """
+    Replace the past-reports collection with an empty one for the current model
+
+    Any existing (possibly stale) collection is deleted first; the caller
+    adds freshly embedded reports.
+    """
+    from ai.chroma_embeddings import shared_embedding_function
+    try:
+        client.delete_collection(COLLECTION_NAME)
+    except Exception:
+        pass  # Collection might not exist
+    return client.create_collection(
+        name=COLLECTION_NAME,
+        metadata=report_collection_metadata(),
+        embedding_function=embedding_function or shared_embedding_function()
+    )
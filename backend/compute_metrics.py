@@ -1,30 +1,97 @@
+import functools
+import logging
 import pandas as pd
 import numpy as np
 import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Dict, Any
 
+logger = logging.getLogger(__name__)
+
+DATA_DIR = "data"
+MARKET_DATASETS = ("acwi", "sp500")
+
+# Only these columns are used by the metrics below
+PRICE_COLUMNS = ["Close", "High"]
+
+# One worker per dataset; shared across requests so threads aren't respawned
+_metrics_executor = ThreadPoolExecutor(max_workers=len(MARKET_DATASETS), thread_name_prefix="metrics")
+
 def load_market_data() -> Dict[str, pd.DataFrame]:
-    """Load market data from CSV files"""
-    data_files = {
-        "acwi": "data/acwi.csv",
-        "sp500": "data/sp500.csv"
-    }
+    """
+    Load market data, preferring the Parquet files over the legacy CSVs
     
+    Parquet keeps the typed, timezone-naive Date index, so only the two
+    price columns are read and no date parsing is needed. Parsed frames are
+    cached per file modification time, so repeated requests skip the disk
+    until the data is fetched again.
+    """
     datasets = {}
-    for name, filepath in data_files.items():
-        if not os.path.exists(filepath):
-            raise FileNotFoundError(f"Data file not found: {filepath}. Please run fetch data first.")
+    for name in MARKET_DATASETS:
+        parquet_path = os.path.join(DATA_DIR, f"{name}.parquet")
+        csv_path = os.path.join(DATA_DIR, f"{name}.csv")
+        
+        if os.path.exists(parquet_path):
+            filepath = parquet_path
+        elif os.path.exists(csv_path):
+            filepath = csv_path
+        else:
+            raise FileNotFoundError(f"Data file not found: {parquet_path}. Please run fetch data first.")
         
-        # Read CSV without parsing dates first
-        df = pd.read_csv(filepath)
-        # Parse dates manually to handle timezone properly
-        df['Date'] = pd.to_datetime(df['Date'], utc=True).dt.tz_localize(None)
-        df.set_index('Date', inplace=True)
-        datasets[name] = df
+        datasets[name] = _read_market_file(filepath, os.path.getmtime(filepath))
         
     return datasets
 
+@functools.lru_cache(maxsize=8)
+def _read_market_file(filepath: str, mtime: float) -> pd.DataFrame:
+    """Parse one market data file; mtime is part of the cache key only"""
+    if filepath.endswith(".parquet"):
+        return _sorted_by_date(pd.read_parquet(filepath, columns=PRICE_COLUMNS))
+    
+    # pyarrow's multithreaded reader, skipping the unused Open/Low/Volume columns
+    df = pd.read_csv(filepath, engine='pyarrow', usecols=['Date', *PRICE_COLUMNS])
+    # Normalize dates to timezone-naive UTC (older CSVs carry exchange offsets)
+    df['Date'] = pd.to_datetime(df['Date'], utc=True).dt.tz_localize(None)
+    df.set_index('Date', inplace=True)
+    return _sorted_by_date(df)
+
+def _sorted_by_date(df: pd.DataFrame) -> pd.DataFrame:
+    """Ensure a monotonic date index, which the searchsorted lookups rely on"""
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
+    return df
+
+@dataclass(frozen=True)
+class MarketArrays:
+    """Date index and price columns of one dataset as read-only numpy arrays"""
+    idx: np.ndarray
+    close: np.ndarray
+    high: np.ndarray
+    
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "MarketArrays":
+        return cls(
+            idx=df.index.values,
+            close=df['Close'].to_numpy(dtype=np.float64),
+            high=df['High'].to_numpy(dtype=np.float64)
+        )
+    
+    def bounds(self, start_date: datetime, end_date: datetime) -> tuple:
+        """[start, end) positions of the rows dated start_date..end_date inclusive"""
+        start = np.searchsorted(self.idx, np.datetime64(start_date), side='left')
+        end = np.searchsorted(self.idx, np.datetime64(end_date), side='right')
+        return start, end
+
+# (month, day) each calendar quarter starts on
+_QUARTER_STARTS = {
+    1: (1, 1),   # Q1: Jan-Mar
+    2: (4, 1),   # Q2: Apr-Jun
+    3: (7, 1),   # Q3: Jul-Sep
+    4: (10, 1),  # Q4: Oct-Dec
+}
+
 def get_quarter_dates(quarter_offset: int = 0) -> tuple:
     """
     Get start and end dates for a specific quarter
@@ -39,71 +106,58 @@ def get_quarter_dates(quarter_offset: int = 0) -> tuple:
     
     # Determine current quarter
     current_quarter = (today.month - 1) // 3 + 1
-    current_year = today.year
-    
-    # Adjust for offset
-    target_quarter = current_quarter + quarter_offset
-    target_year = current_year
-    
-    while target_quarter <= 0:
-        target_quarter += 4
-        target_year -= 1
     
-    while target_quarter > 4:
-        target_quarter -= 4
-        target_year += 1
+    # Adjust for offset: count quarters from Q1 (0-based) and carry whole years
+    year_offset, quarter_index = divmod(current_quarter - 1 + quarter_offset, 4)
+    target_quarter = quarter_index + 1
+    target_year = today.year + year_offset
     
-    # Calculate quarter start and end dates
-    quarter_starts = {
-        1: (1, 1),   # Q1: Jan-Mar
-        2: (4, 1),   # Q2: Apr-Jun  
-        3: (7, 1),   # Q3: Jul-Sep
-        4: (10, 1),  # Q4: Oct-Dec
-    }
-    
-    start_month, start_day = quarter_starts[target_quarter]
+    start_month, start_day = _QUARTER_STARTS[target_quarter]
     start_date = datetime(target_year, start_month, start_day)
     
     # End date is start of next quarter minus 1 day
     if target_quarter == 4:
         end_date = datetime(target_year + 1, 1, 1) - timedelta(days=1)
     else:
-        next_month, _ = quarter_starts[target_quarter + 1]
+        next_month, _ = _QUARTER_STARTS[target_quarter + 1]
         end_date = datetime(target_year, next_month, 1) - timedelta(days=1)
     
     return start_date, end_date
 
-def calculate_return(data: pd.DataFrame, start_date: datetime, end_date: datetime) -> float:
+def calculate_return(data: MarketArrays, start_date: datetime, end_date: datetime) -> float:
     """Calculate return between two dates"""
-    # Now that data is timezone-naive, we can do direct comparison
-    mask = (data.index >= start_date) & (data.index <= end_date)
-    period_data = data[mask]
+    start, end = data.bounds(start_date, end_date)
     
-    if len(period_data) < 2:
+    if end - start < 2:
         return 0.0
     
-    start_price = period_data['Close'].iloc[0]
-    end_price = period_data['Close'].iloc[-1]
+    start_price = data.close[start]
+    end_price = data.close[end - 1]
     
-    return ((end_price - start_price) / start_price) * 100
+    return float((end_price - start_price) / start_price * 100)
 
-def count_new_highs(data: pd.DataFrame, start_date: datetime, end_date: datetime) -> int:
+def count_new_highs(data: MarketArrays, start_date: datetime, end_date: datetime) -> int:
     """Count number of new highs during the period"""
-    # Now that data is timezone-naive, we can do direct comparison
-    period_data = data[(data.index >= start_date) & (data.index <= end_date)]
+    start, end = data.bounds(start_date, end_date)
+    highs = data.high[start:end]
     
-    if len(period_data) == 0:
+    # The running max is seeded with the first day's high; if that is missing
+    # no later day compares greater, so there are no new highs
+    if len(highs) == 0 or np.isnan(highs[0]):
         return 0
     
-    new_highs = 0
-    running_max = period_data['High'].iloc[0]
-    
-    for high in period_data['High']:
-        if high > running_max:
-            new_highs += 1
-            running_max = high
-    
-    return new_highs
+    # A new high is any day above the running max of the days before it;
+    # fmax skips later missing prices, which never compare greater
+    running_max = np.fmax.accumulate(highs)
+    return int((highs[1:] > running_max[:-1]).sum())
+
+def _compute_for(data: MarketArrays, q_start: datetime, q_end: datetime, ytd_start: datetime) -> tuple:
+    """(quarter return, YTD return, new highs) for one dataset"""
+    return (
+        calculate_return(data, q_start, q_end),
+        calculate_return(data, ytd_start, q_end),
+        count_new_highs(data, q_start, q_end)
+    )
 
 def compute_quarterly_metrics() -> Dict[str, Any]:
     """
@@ -115,28 +169,24 @@ def compute_quarterly_metrics() -> Dict[str, Any]:
     try:
         # Load market data
         datasets = load_market_data()
-        acwi_data = datasets["acwi"]
-        sp500_data = datasets["sp500"]
+        # Extract the date index and price columns once per dataset
+        acwi_data = MarketArrays.from_frame(datasets["acwi"])
+        sp500_data = MarketArrays.from_frame(datasets["sp500"])
         
         # Get date ranges
         q_start, q_end = get_quarter_dates(-1)  # Previous completed quarter
         ytd_start = datetime(q_end.year, 1, 1)  # Year to date
         
-        print(f"Computing metrics for Q{((q_start.month - 1) // 3) + 1} {q_start.year}")
-        print(f"Quarter: {q_start.date()} to {q_end.date()}")
-        print(f"YTD: {ytd_start.date()} to {q_end.date()}")
-        
-        # Calculate quarterly returns
-        acwi_quarter_return = calculate_return(acwi_data, q_start, q_end)
-        sp500_quarter_return = calculate_return(sp500_data, q_start, q_end)
+        logger.debug("Computing metrics for Q%d %d", ((q_start.month - 1) // 3) + 1, q_start.year)
+        logger.debug("Quarter: %s to %s", q_start.date(), q_end.date())
+        logger.debug("YTD: %s to %s", ytd_start.date(), q_end.date())
         
-        # Calculate YTD returns
-        acwi_ytd_return = calculate_return(acwi_data, ytd_start, q_end)
-        sp500_ytd_return = calculate_return(sp500_data, ytd_start, q_end)
-        
-        # Count new highs
-        acwi_new_highs = count_new_highs(acwi_data, q_start, q_end)
-        sp500_new_highs = count_new_highs(sp500_data, q_start, q_end)
+        # The two indices are independent; numpy releases the GIL, so their
+        # quarter return, YTD return and new-high counts run in parallel
+        acwi_future = _metrics_executor.submit(_compute_for, acwi_data, q_start, q_end, ytd_start)
+        sp500_future = _metrics_executor.submit(_compute_for, sp500_data, q_start, q_end, ytd_start)
+        acwi_quarter_return, acwi_ytd_return, acwi_new_highs = acwi_future.result()
+        sp500_quarter_return, sp500_ytd_return, sp500_new_highs = sp500_future.result()
         
         metrics = {
             "acwi_quarter_return": round(acwi_quarter_return, 2),
@@ -150,9 +200,8 @@ def compute_quarterly_metrics() -> Dict[str, Any]:
             "period_end": q_end.strftime("%Y-%m-%d")
         }
         
-        print("\n📊 Computed Metrics:")
-        for key, value in metrics.items():
-            print(f"  {key}: {value}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("📊 Computed Metrics:\n%s", "\n".join(f"  {key}: {value}" for key, value in metrics.items()))
         
         return metrics
         
@@ -160,6 +209,8 @@ def compute_quarterly_metrics() -> Dict[str, Any]:
         raise Exception(f"Error computing metrics: {str(e)}")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s")
+    
     # Test the function
     try:
         metrics = compute_quarterly_metrics()
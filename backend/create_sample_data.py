@@ -1,8 +1,15 @@
-import pandas as pd
-import numpy as np
 from datetime import datetime, timedelta
+import logging
 import os
 
+from lazy import lazy
+
+# Only needed once sample data is actually generated
+pd = lazy("pandas")
+np = lazy("numpy")
+
+logger = logging.getLogger(__name__)
+
 def create_sample_data():
     """Create sample market data for testing"""
     
@@ -16,64 +23,57 @@ def create_sample_data():
     dates = pd.date_range(start=start_date, end=end_date, freq='D')
     
     # Remove weekends
-    dates = [d for d in dates if d.weekday() < 5]
-    
-    # Generate sample ACWI data
-    np.random.seed(42)  # For reproducible results
-    
-    # ACWI sample data
-    acwi_base_price = 100
-    acwi_prices = [acwi_base_price]
+    dates = dates[dates.weekday < 5]
+    n = len(dates)
     
-    for i in range(1, len(dates)):
-        # Random walk with slight upward bias
-        change = np.random.normal(0.001, 0.015)  # 0.1% daily return, 1.5% volatility
-        new_price = acwi_prices[-1] * (1 + change)
-        acwi_prices.append(new_price)
+    # ACWI sample data: random walk with slight upward bias
+    # (0.1% daily return, 1.5% volatility)
+    rng = np.random.default_rng(42)  # For reproducible results
+    acwi_prices = 100 * np.cumprod(np.r_[1.0, 1 + rng.normal(0.001, 0.015, n - 1)])
     
     # Create ACWI DataFrame
     acwi_data = pd.DataFrame({
-        'Open': [p * (1 + np.random.normal(0, 0.002)) for p in acwi_prices],
-        'High': [p * (1 + abs(np.random.normal(0.005, 0.003))) for p in acwi_prices],
-        'Low': [p * (1 - abs(np.random.normal(0.005, 0.003))) for p in acwi_prices],
+        'Open': acwi_prices * (1 + rng.normal(0, 0.002, n)),
+        'High': acwi_prices * (1 + np.abs(rng.normal(0.005, 0.003, n))),
+        'Low': acwi_prices * (1 - np.abs(rng.normal(0.005, 0.003, n))),
         'Close': acwi_prices,
-        'Volume': [np.random.randint(1000000, 5000000) for _ in acwi_prices]
-    }, index=dates[:len(acwi_prices)])
+        'Volume': rng.integers(1_000_000, 5_000_000, n)
+    }, index=dates)
     
-    # S&P 500 sample data
-    np.random.seed(24)  # Different seed for S&P
-    sp500_base_price = 4000
-    sp500_prices = [sp500_base_price]
-    
-    for i in range(1, len(dates)):
-        # Random walk with slight upward bias
-        change = np.random.normal(0.0012, 0.018)  # 0.12% daily return, 1.8% volatility
-        new_price = sp500_prices[-1] * (1 + change)
-        sp500_prices.append(new_price)
+    # S&P 500 sample data (0.12% daily return, 1.8% volatility)
+    rng = np.random.default_rng(24)  # Different seed for S&P
+    sp500_prices = 4000 * np.cumprod(np.r_[1.0, 1 + rng.normal(0.0012, 0.018, n - 1)])
     
     # Create S&P 500 DataFrame
     sp500_data = pd.DataFrame({
-        'Open': [p * (1 + np.random.normal(0, 0.002)) for p in sp500_prices],
-        'High': [p * (1 + abs(np.random.normal(0.006, 0.004))) for p in sp500_prices],
-        'Low': [p * (1 - abs(np.random.normal(0.006, 0.004))) for p in sp500_prices],
+        'Open': sp500_prices * (1 + rng.normal(0, 0.002, n)),
+        'High': sp500_prices * (1 + np.abs(rng.normal(0.006, 0.004, n))),
+        'Low': sp500_prices * (1 - np.abs(rng.normal(0.006, 0.004, n))),
         'Close': sp500_prices,
-        'Volume': [np.random.randint(3000000, 8000000) for _ in sp500_prices]
-    }, index=dates[:len(sp500_prices)])
+        'Volume': rng.integers(3_000_000, 8_000_000, n)
+    }, index=dates)
+    
+    acwi_data.index.name = 'Date'
+    sp500_data.index.name = 'Date'
     
-    # Save to CSV files
-    acwi_file = os.path.join(data_dir, "acwi.csv")
-    sp500_file = os.path.join(data_dir, "sp500.csv")
+    # Save to Parquet files (CSV copies only when MARKET_DATA_CSV=1)
+    acwi_file = os.path.join(data_dir, "acwi.parquet")
+    sp500_file = os.path.join(data_dir, "sp500.parquet")
     
-    acwi_data.to_csv(acwi_file)
-    sp500_data.to_csv(sp500_file)
+    acwi_data.to_parquet(acwi_file, engine='pyarrow', compression='snappy')
+    sp500_data.to_parquet(sp500_file, engine='pyarrow', compression='snappy')
     
-    print(f"✅ Created sample ACWI data: {acwi_file} ({len(acwi_data)} rows)")
-    print(f"✅ Created sample S&P 500 data: {sp500_file} ({len(sp500_data)} rows)")
+    if os.getenv("MARKET_DATA_CSV") == "1":
+        acwi_data.to_csv(os.path.join(data_dir, "acwi.csv"))
+        sp500_data.to_csv(os.path.join(data_dir, "sp500.csv"))
+    
+    logger.info("✅ Created sample ACWI data: %s (%d rows)", acwi_file, len(acwi_data))
+    logger.info("✅ Created sample S&P 500 data: %s (%d rows)", sp500_file, len(sp500_data))
     
     # Print some summary stats
-    print("\n📊 Sample Data Summary:")
-    print(f"ACWI - Start: ${acwi_data['Close'].iloc[0]:.2f}, End: ${acwi_data['Close'].iloc[-1]:.2f}")
-    print(f"S&P 500 - Start: ${sp500_data['Close'].iloc[0]:.2f}, End: ${sp500_data['Close'].iloc[-1]:.2f}")
+    logger.info("📊 Sample Data Summary:")
+    logger.info("ACWI - Start: $%.2f, End: $%.2f", acwi_data['Close'].iloc[0], acwi_data['Close'].iloc[-1])
+    logger.info("S&P 500 - Start: $%.2f, End: $%.2f", sp500_data['Close'].iloc[0], sp500_data['Close'].iloc[-1])
     
     return {
         "acwi_file": acwi_file,
@@ -83,6 +83,8 @@ def create_sample_data():
     }
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    
     # Create sample data
     result = create_sample_data()
     print("\nSample data created successfully!")
\ No newline at end of file
@@ -1,8 +1,44 @@
 import yfinance as yf
 import pandas as pd
+import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from typing import Dict, Any, List
+
+logger = logging.getLogger(__name__)
+
+def _fetch_one(name: str, ticker: str, start_date: datetime, end_date: datetime, data_dir: str) -> List[str]:
+    """Download one ticker's daily history and save it; returns the files written"""
+    logger.info("Fetching data for %s (%s)...", name, ticker)
+    
+    # Fetch data
+    stock = yf.Ticker(ticker)
+    data = stock.history(
+        start=start_date.strftime('%Y-%m-%d'),
+        end=end_date.strftime('%Y-%m-%d'),
+        interval="1d"
+    )
+    
+    if data.empty:
+        raise Exception(f"No data found for {ticker}")
+    
+    # Store a timezone-naive UTC date index so loading needs no date parsing
+    data.index = data.index.tz_convert('UTC').tz_localize(None)
+    data.index.name = 'Date'
+    
+    # Save to Parquet (CSV copy only when MARKET_DATA_CSV=1)
+    filepath = os.path.join(data_dir, f"{name.lower()}.parquet")
+    data.to_parquet(filepath, engine='pyarrow', compression='snappy')
+    files = [filepath]
+    
+    if os.getenv("MARKET_DATA_CSV") == "1":
+        csv_path = os.path.join(data_dir, f"{name.lower()}.csv")
+        data.to_csv(csv_path)
+        files.append(csv_path)
+    
+    logger.info("✅ Saved %s data to %s (%d rows)", name, filepath, len(data))
+    return files
 
 def fetch_market_data() -> Dict[str, Any]:
     """
@@ -26,29 +62,13 @@ def fetch_market_data() -> Dict[str, Any]:
         end_date = datetime.now()
         start_date = end_date - timedelta(days=730)  # ~2 years
         
-        files_created = []
-        
-        for name, ticker in tickers.items():
-            print(f"Fetching data for {name} ({ticker})...")
-            
-            # Fetch data
-            stock = yf.Ticker(ticker)
-            data = stock.history(
-                start=start_date.strftime('%Y-%m-%d'),
-                end=end_date.strftime('%Y-%m-%d'),
-                interval="1d"
-            )
-            
-            if data.empty:
-                raise Exception(f"No data found for {ticker}")
-            
-            # Save to CSV
-            filename = f"{name.lower()}.csv"
-            filepath = os.path.join(data_dir, filename)
-            data.to_csv(filepath)
-            files_created.append(filepath)
-            
-            print(f"✅ Saved {name} data to {filepath} ({len(data)} rows)")
+        # Each ticker is an independent HTTPS round-trip, so fetch them concurrently
+        with ThreadPoolExecutor(max_workers=len(tickers)) as pool:
+            futures = [
+                pool.submit(_fetch_one, name, ticker, start_date, end_date, data_dir)
+                for name, ticker in tickers.items()
+            ]
+            files_created = [path for future in futures for path in future.result()]
         
         return {
             "status": "success",
@@ -60,6 +80,8 @@ def fetch_market_data() -> Dict[str, Any]:
         raise Exception(f"Error fetching market data: {str(e)}")
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    
     # Test the function
     result = fetch_market_data()
     print("\nFetch Data Result:")
@@ -0,0 +1,43 @@
+import importlib
+import importlib.util
+import os
+import sys
+from types import ModuleType
+
+
+def lazy(name: str) -> ModuleType:
+    """
+    Import a module lazily: its body runs on the first attribute access
+
+    Uses the stdlib importlib.util.LazyLoader, so heavy packages (pandas,
+    numpy, google.generativeai, chromadb) cost nothing until actually used.
+    A missing module still raises ModuleNotFoundError here, at the call.
+    Set AIQR_EAGER_IMPORT=1 to import everything immediately instead (for
+    catching import errors in CI).
+
+    Args:
+        name: Absolute module name, e.g. "google.generativeai"
+
+    Returns:
+        ModuleType: The (possibly not yet loaded) module
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    if os.getenv("AIQR_EAGER_IMPORT") == "1":
+        return importlib.import_module(name)
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+
+    # Mirror a regular import, which binds submodules on their parent package
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
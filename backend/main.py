@@ -1,13 +1,18 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 import uvicorn
+import asyncio
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from dotenv import load_dotenv
 
+from ai.async_utils import iterate_async, run_async
+
 # Load environment variables
 load_dotenv()
 
@@ -26,67 +31,128 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize AI components lazily
+# Initialize AI components lazily; each getter uses double-checked locking so
+# concurrent first requests (or the startup warmup) construct a component once
 report_generator = None
 report_validator = None
 style_scorer = None
 memory_loader = None
+ai_pipeline = None
+
+_report_generator_lock = threading.Lock()
+_report_validator_lock = threading.Lock()
+_style_scorer_lock = threading.Lock()
+_memory_loader_lock = threading.Lock()
+_ai_pipeline_lock = threading.Lock()
 
 def get_report_generator():
     """Lazy initialization of report generator"""
     global report_generator
     if report_generator is None:
-        try:
-            from ai.generator_simple import ReportGenerator
-            report_generator = ReportGenerator()
-        except Exception as e:
-            print(f"⚠️ Warning: Failed to initialize ReportGenerator: {e}")
-            report_generator = False
+        with _report_generator_lock:
+            if report_generator is None:
+                try:
+                    from ai.generator_simple import ReportGenerator
+                    report_generator = ReportGenerator()
+                except Exception as e:
+                    print(f"⚠️ Warning: Failed to initialize ReportGenerator: {e}")
+                    report_generator = False
     return report_generator if report_generator is not False else None
 
 def get_report_validator():
     """Lazy initialization of report validator"""
     global report_validator
     if report_validator is None:
-        try:
-            from ai.validator_simple import ReportValidator
-            report_validator = ReportValidator()
-        except Exception as e:
-            print(f"⚠️ Warning: Failed to initialize ReportValidator: {e}")
-            report_validator = False
+        with _report_validator_lock:
+            if report_validator is None:
+                try:
+                    from ai.validator_simple import ReportValidator
+                    report_validator = ReportValidator()
+                except Exception as e:
+                    print(f"⚠️ Warning: Failed to initialize ReportValidator: {e}")
+                    report_validator = False
     return report_validator if report_validator is not False else None
 
 def get_style_scorer():
     """Lazy initialization of style scorer"""
     global style_scorer
     if style_scorer is None:
-        try:
-            from ai.style_scorer_simple import StyleScorer
-            style_scorer = StyleScorer()
-        except Exception as e:
-            print(f"⚠️ Warning: Failed to initialize StyleScorer: {e}")
-            style_scorer = False
+        with _style_scorer_lock:
+            if style_scorer is None:
+                try:
+                    from ai.style_scorer_simple import StyleScorer
+                    style_scorer = StyleScorer()
+                except Exception as e:
+                    print(f"⚠️ Warning: Failed to initialize StyleScorer: {e}")
+                    style_scorer = False
     return style_scorer if style_scorer is not False else None
 
 def get_memory_loader():
     """Lazy initialization of memory loader"""
     global memory_loader
     if memory_loader is None:
-        try:
-            from ai.memory_loader import MemoryLoader
-            memory_loader = MemoryLoader()
-            memory_loader.load_past_reports()
-            print("✅ Past reports loaded into vector database")
-        except Exception as e:
-            print(f"⚠️ Warning: Failed to initialize MemoryLoader: {e}")
-            memory_loader = False
+        with _memory_loader_lock:
+            if memory_loader is None:
+                try:
+                    from ai.memory_loader import MemoryLoader
+                    loader = MemoryLoader()
+                    loader.load_past_reports()
+                    memory_loader = loader
+                    print("✅ Past reports loaded into vector database")
+                except Exception as e:
+                    print(f"⚠️ Warning: Failed to initialize MemoryLoader: {e}")
+                    memory_loader = False
     return memory_loader if memory_loader is not False else None
 
+def get_ai_pipeline():
+    """Lazy initialization of the combined style + validation pipeline"""
+    global ai_pipeline
+    if ai_pipeline is None:
+        scorer = get_style_scorer()
+        validator = get_report_validator()
+        if scorer is None or validator is None:
+            return None
+        with _ai_pipeline_lock:
+            if ai_pipeline is None:
+                try:
+                    from ai.pipeline import AiPipeline
+                    ai_pipeline = AiPipeline(scorer, validator)
+                except Exception as e:
+                    print(f"⚠️ Warning: Failed to initialize AiPipeline: {e}")
+                    ai_pipeline = False
+    return ai_pipeline if ai_pipeline is not False else None
+
+def warmup_ai_components():
+    """Construct the AI components and load the embedding model ahead of the first request"""
+    try:
+        # Independent constructors run side by side; the past reports are
+        # (re)loaded before the style scorer takes its collection handle
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix="ai-warmup") as pool:
+            futures = [
+                pool.submit(get_report_generator),
+                pool.submit(get_report_validator),
+                pool.submit(get_memory_loader)
+            ]
+            for future in futures:
+                future.result()
+        
+        scorer = get_style_scorer()
+        if scorer is not None:
+            scorer.warmup()
+        print("✅ AI components warmed up")
+    except Exception as e:
+        print(f"⚠️ Warning: AI warmup failed: {e}")
+
 # Light startup
 @app.on_event("startup")
 def startup_event():
-    """Light startup - no heavy AI loading"""
+    """Light startup - no heavy AI loading unless AI_WARMUP=1"""
     print("🚀 AI Quarterly Reports API started successfully")
+    
+    # Opt-in: warming loads torch, MiniLM and Chroma at boot, too much for
+    # memory-constrained hosts such as the Render free tier
+    if os.getenv("AI_WARMUP", "0") == "1":
+        threading.Thread(target=warmup_ai_components, name="ai-warmup", daemon=True).start()
 
 # Request models
 class GenerateReportRequest(BaseModel):
@@ -99,6 +165,10 @@ class ValidateReportRequest(BaseModel):
 class StyleScoreRequest(BaseModel):
     report: str
 
+class AnalyzeReportRequest(BaseModel):
+    report: str
+    metrics: dict
+
 @app.get("/api")
 async def root():
     return {
@@ -108,7 +178,7 @@ async def root():
     }
 
 @app.get("/api/fetch")
-async def fetch_data():
+def fetch_data():
     """Fetch ACWI and S&P 500 market data"""
     try:
         from fetch_data import fetch_market_data
@@ -122,7 +192,7 @@ async def fetch_data():
         raise HTTPException(status_code=500, detail=f"Failed to fetch data: {str(e)}")
 
 @app.get("/api/metrics")
-async def get_metrics():
+def get_metrics():
     """Compute quarterly metrics from fetched data"""
     try:
         from compute_metrics import compute_quarterly_metrics
@@ -132,14 +202,14 @@ async def get_metrics():
         raise HTTPException(status_code=500, detail=f"Failed to compute metrics: {str(e)}")
 
 @app.post("/api/report-ai")
-def generate_report_ai(request: GenerateReportRequest):
+async def generate_report_ai(request: GenerateReportRequest):
     """Generate AI-powered quarterly report"""
     try:
-        generator = get_report_generator()
+        generator = await asyncio.to_thread(get_report_generator)
         if generator is None:
             raise HTTPException(status_code=503, detail="AI service unavailable - API key not configured")
         
-        report = generator.generate(request.metrics)
+        report = await run_async(generator.generate_async(request.metrics))
         return JSONResponse(content={
             "report": report,
             "status": "success"
@@ -147,32 +217,57 @@ def generate_report_ai(request: GenerateReportRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate report: {str(e)}")
 
+@app.post("/api/report-ai/stream")
+async def stream_report_ai(request: GenerateReportRequest):
+    """Stream the AI-generated report as plain text while Gemini writes it"""
+    generator = await asyncio.to_thread(get_report_generator)
+    if generator is None:
+        raise HTTPException(status_code=503, detail="AI service unavailable - API key not configured")
+    
+    return StreamingResponse(
+        iterate_async(generator.generate_stream_async(request.metrics)),
+        media_type="text/plain; charset=utf-8"
+    )
+
 @app.post("/api/validate-ai")
-def validate_report_ai(request: ValidateReportRequest):
-    """Validate report using deterministic and AI methods"""
+async def validate_report_ai(request: ValidateReportRequest, no_cache: bool = False):
+    """Validate report using deterministic and AI methods (no_cache=true forces a fresh check)"""
     try:
-        validator = get_report_validator()
+        validator = await asyncio.to_thread(get_report_validator)
         if validator is None:
             raise HTTPException(status_code=503, detail="AI service unavailable - API key not configured")
         
-        validation_result = validator.validate(request.report, request.metrics)
+        validation_result = await run_async(validator.validate_async(request.report, request.metrics, use_cache=not no_cache))
         return JSONResponse(content=validation_result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to validate report: {str(e)}")
 
 @app.post("/api/style-score-ai")
-def get_style_score_ai(request: StyleScoreRequest):
-    """Get style similarity score using RAG"""
+async def get_style_score_ai(request: StyleScoreRequest, no_cache: bool = False):
+    """Get style similarity score using RAG (no_cache=true forces a fresh score)"""
     try:
-        scorer = get_style_scorer()
+        scorer = await asyncio.to_thread(get_style_scorer)
         if scorer is None:
             raise HTTPException(status_code=503, detail="AI service unavailable - API key not configured")
         
-        style_result = scorer.score_sync(request.report)
+        style_result = await run_async(scorer.score_async(request.report, use_cache=not no_cache))
         return JSONResponse(content=style_result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to compute style score: {str(e)}")
 
+@app.post("/api/analyze-ai")
+async def analyze_report_ai(request: AnalyzeReportRequest):
+    """Style score and validate a report with a single Gemini call"""
+    try:
+        pipeline = await asyncio.to_thread(get_ai_pipeline)
+        if pipeline is None:
+            raise HTTPException(status_code=503, detail="AI service unavailable - API key not configured")
+        
+        result = await run_async(pipeline.analyze_and_validate_async(request.report, request.metrics))
+        return JSONResponse(content=result)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to analyze report: {str(e)}")
+
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
@@ -182,7 +277,8 @@ async def health_check():
             "generator": "lazy_loaded" if report_generator is None else ("ready" if report_generator else "failed"),
             "validator": "lazy_loaded" if report_validator is None else ("ready" if report_validator else "failed"),
             "style_scorer": "lazy_loaded" if style_scorer is None else ("ready" if style_scorer else "failed"),
-            "memory_loader": "lazy_loaded" if memory_loader is None else ("ready" if memory_loader else "failed")
+            "memory_loader": "lazy_loaded" if memory_loader is None else ("ready" if memory_loader else "failed"),
+            "pipeline": "lazy_loaded" if ai_pipeline is None else ("ready" if ai_pipeline else "failed")
         }
     }
 
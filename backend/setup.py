@@ -4,14 +4,49 @@ Setup script for AI Quarterly Reports application
 Creates sample data and initializes the environment
 """
 
+import functools
+import importlib.metadata
 import os
+import re
 import sys
-import shutil
+from datetime import date, timedelta
 from pathlib import Path
 
+# Required distributions, by their pip names
+REQUIRED_PACKAGES = [
+    'fastapi',
+    'uvicorn',
+    'pandas',
+    'numpy',
+    'google-generativeai',
+    'chromadb',
+    'python-dotenv',
+    'pydantic',
+    'sentence-transformers'
+]
+
+# Import names that aren't just the pip name with '-' -> '_'
+MODULE_NAMES = {
+    'google-generativeai': 'google.generativeai',
+    'python-dotenv': 'dotenv'
+}
+
+# Bump when create_sample_data changes its output, so setup regenerates it.
+# The marker holds "<version> <last covered date>"
+SAMPLE_DATA_VERSION = "2"
+SAMPLE_DATA_FILES = [Path("data/acwi.parquet"), Path("data/sp500.parquet")]
+SAMPLE_DATA_MARKER = Path("data/.sample_data.done")
+
+# The .env template lives at the repository root, next to backend/
+ENV_TEMPLATE = Path(__file__).resolve().parent.parent / ".env.example"
+
+# Touched after a successful setup; setup reruns once an input is newer
+SETUP_MARKER = Path(".setup_done")
+SETUP_INPUTS = [Path("requirements.txt"), ENV_TEMPLATE]
+
 def create_env_file():
     """Create .env file from template"""
-    env_template = Path(".env.example")
+    env_template = ENV_TEMPLATE
     env_file = Path(".env")
     
     if env_file.exists():
@@ -19,47 +54,105 @@ def create_env_file():
         return
     
     if not env_template.exists():
-        print("❌ .env.example not found")
+        print(f"❌ {env_template} not found")
         return
     
-    # Copy template to .env
-    shutil.copy(env_template, env_file)
+    # Copy template to .env (a tiny file: one read, one write, no copymode)
+    env_file.write_bytes(env_template.read_bytes())
     print("✅ Created .env file from template")
     print("🔧 Please edit .env and add your GEMINI_API_KEY")
 
+def previous_quarter_end(today: date) -> date:
+    """Last day of the previous completed quarter (the one /api/metrics reports)"""
+    quarter_start_month = 3 * ((today.month - 1) // 3) + 1
+    return date(today.year, quarter_start_month, 1) - timedelta(days=1)
+
+def sample_data_present() -> bool:
+    """
+    Whether this version of the sample data exists and still covers the
+    previous completed quarter
+    
+    The sample data ends on the day it was generated, so it goes stale once
+    a new quarter completes after that day.
+    """
+    try:
+        version, covered_until = SAMPLE_DATA_MARKER.read_text().split()
+        if version != SAMPLE_DATA_VERSION:
+            return False
+        if date.fromisoformat(covered_until) < previous_quarter_end(date.today()):
+            return False
+        return all(path.stat().st_size > 0 for path in SAMPLE_DATA_FILES)
+    except (OSError, ValueError):
+        # Missing or old-format marker
+        return False
+
 def create_sample_data():
     """Create sample market data"""
+    # Checked before the import, which pulls in pandas and numpy
+    if sample_data_present():
+        print("✅ Sample market data present")
+        return True
+    
     try:
         # Import and run the sample data creation
         from create_sample_data import create_sample_data
         result = create_sample_data()
+        SAMPLE_DATA_MARKER.write_text(f"{SAMPLE_DATA_VERSION} {date.today().isoformat()}")
         print("✅ Sample market data created successfully")
         return True
     except Exception as e:
         print(f"❌ Failed to create sample data: {e}")
         return False
 
+# Printed after a successful setup, in one write
+EPILOGUE_LINES = (
+    "",
+    "=" * 50,
+    "🎉 Setup completed successfully!",
+    "",
+    "📋 Next steps:",
+    "1. Edit .env file and add your GEMINI_API_KEY",
+    "2. Start the backend: uvicorn main:app --reload",
+    "3. Start the frontend: cd ../frontend && npm install && npm run dev",
+    "",
+    "🌐 Frontend: http://localhost:3000",
+    "🔗 Backend: http://localhost:8000",
+    "📚 API Docs: http://localhost:8000/docs"
+)
+
+def normalize_name(name: str) -> str:
+    """PEP 503 normalized distribution name (e.g. Google_GenerativeAI -> google-generativeai)"""
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+@functools.lru_cache(maxsize=1)
+def installed_distributions() -> frozenset:
+    """
+    Normalized names of all installed distributions
+    
+    One scan of the *.dist-info metadata on sys.path; no package code runs,
+    so heavy packages (pandas, torch, grpc) aren't imported.
+    """
+    return frozenset(
+        normalize_name(dist.metadata['Name'])
+        for dist in importlib.metadata.distributions()
+        if dist.metadata['Name']
+    )
+
 def check_dependencies():
     """Check if required packages are installed"""
-    required_packages = [
-        'fastapi',
-        'uvicorn',
-        'pandas', 
-        'numpy',
-        'google-generativeai',
-        'chromadb',
-        'python-dotenv',
-        'pydantic',
-        'sentence-transformers'
+    # Packages already imported in this process are installed; only scan
+    # the distribution metadata if some haven't been
+    unimported = [
+        package for package in REQUIRED_PACKAGES
+        if MODULE_NAMES.get(package, package.replace('-', '_')) not in sys.modules
     ]
-    
     missing_packages = []
-    
-    for package in required_packages:
-        try:
-            __import__(package.replace('-', '_'))
-        except ImportError:
-            missing_packages.append(package)
+    if unimported:
+        installed = installed_distributions()
+        missing_packages = [
+            package for package in unimported
+            if normalize_name(package) not in installed
+        ]
     
     if missing_packages:
         print(f"❌ Missing packages: {', '.join(missing_packages)}")
@@ -69,6 +162,22 @@ def check_dependencies():
         print("✅ All required packages are installed")
         return True
 
+def setup_is_fresh() -> bool:
+    """
+    Whether setup already succeeded since its inputs last changed and what
+    it creates (.env, current sample data) is still there
+    """
+    try:
+        done_at = SETUP_MARKER.stat().st_mtime
+    except OSError:
+        return False
+    if not Path(".env").exists() or not sample_data_present():
+        return False
+    return all(
+        path.stat().st_mtime < done_at
+        for path in SETUP_INPUTS if path.exists()
+    )
+
 def main():
     """Main setup function"""
     print("🚀 Setting up AI Quarterly Reports application...")
@@ -77,6 +186,10 @@ def main():
     # Change to backend directory
     os.chdir(Path(__file__).parent)
     
+    if setup_is_fresh():
+        print("✅ Setup fresh (cached) - delete .setup_done to run it again")
+        return
+    
     # Check dependencies
     if not check_dependencies():
         print("\n💡 Install dependencies first:")
@@ -87,17 +200,10 @@ def main():
     create_env_file()
     
     # Create sample data
-    create_sample_data()
+    if create_sample_data():
+        SETUP_MARKER.touch()
     
-    print("\n" + "=" * 50)
-    print("🎉 Setup completed successfully!")
-    print("\n📋 Next steps:")
-    print("1. Edit .env file and add your GEMINI_API_KEY")
-    print("2. Start the backend: uvicorn main:app --reload")
-    print("3. Start the frontend: cd ../frontend && npm install && npm run dev")
-    print("\n🌐 Frontend: http://localhost:3000")
-    print("🔗 Backend: http://localhost:8000")
-    print("📚 API Docs: http://localhost:8000/docs")
+    sys.stdout.write("\n".join(EPILOGUE_LINES) + "\n")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
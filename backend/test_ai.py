@@ -1,25 +1,49 @@
-from ai.generator import ReportGenerator
-import google.generativeai as genai
+import functools
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-# Test the AI directly
-api_key = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=api_key)
-model = genai.GenerativeModel('gemini-2.5-flash')
-
-response = model.generate_content("Generate a simple 2-paragraph financial report about Q3 2025 with ACWI return 7.12% and S&P 500 return 7.47%")
-print("RAW AI RESPONSE:")
-print(response.text)
-print("=" * 50)
-
-# Test the generator
-try:
-    rg = ReportGenerator()
-    result = rg.generate({'acwi_quarter_return': 7.12, 'sp500_quarter_return': 7.47, 'quarter': 'Q3 2025'})
-    print("GENERATOR WORKS:")
-    print(result)
-except Exception as e:
-    print(f"GENERATOR ERROR: {e}")
\ No newline at end of file
+
+from lazy import lazy
+
+# Loaded on first use, so collecting this file (e.g. by pytest) doesn't pull
+# in grpc/protobuf; AIQR_EAGER_IMPORT=1 imports them up front instead
+genai = lazy("google.generativeai")
+generator = lazy("ai.generator")
+
+@functools.lru_cache(maxsize=1)
+def get_model():
+    """Configured Gemini model, built once per process"""
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    return genai.GenerativeModel('gemini-2.5-flash')
+
+@functools.lru_cache(maxsize=1)
+def get_report_generator():
+    """ReportGenerator (embedding model, Chroma, Gemini), built once per process"""
+    return generator.ReportGenerator()
+
+def run_ai_smoke_test():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    if not os.getenv("GEMINI_API_KEY"):
+        print("⚠️ GEMINI_API_KEY not set - skipping AI smoke test")
+        return
+
+    # Test the AI directly
+    model = get_model()
+
+    response = model.generate_content("Generate a simple 2-paragraph financial report about Q3 2025 with ACWI return 7.12% and S&P 500 return 7.47%")
+    print("RAW AI RESPONSE:")
+    print(response.text)
+    print("=" * 50)
+
+    # Test the generator
+    try:
+        rg = get_report_generator()
+        result = rg.generate({'acwi_quarter_return': 7.12, 'sp500_quarter_return': 7.47, 'quarter': 'Q3 2025'})
+        print("GENERATOR WORKS:")
+        print(result)
+    except Exception as e:
+        print(f"GENERATOR ERROR: {e}")
+
+if __name__ == "__main__":
+    run_ai_smoke_test()
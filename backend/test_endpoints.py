@@ -1,69 +1,187 @@
+import argparse
 import requests
 import json
+import os
+import statistics
 import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
 
-def test_all_endpoints():
-    base_url = "http://localhost:8000"
+# (connect, read) seconds; the read budget covers the Gemini calls
+TIMEOUT = (1, 30)
+
+# "http" tests a running server; "inprocess" calls the app directly, no server needed
+TEST_MODE = os.getenv("AIQR_TEST_MODE", "http")
+
+BASE_URL = "" if TEST_MODE == "inprocess" else "http://localhost:8000"
+HEALTH_URL = f"{BASE_URL}/api/health"
+REPORT_URL = f"{BASE_URL}/api/report-ai"
+VALIDATE_URL = f"{BASE_URL}/api/validate-ai"
+STYLE_URL = f"{BASE_URL}/api/style-score-ai"
+
+try:
+    import orjson
+    dumps = orjson.dumps
+except ImportError:
+    def dumps(obj) -> bytes:
+        return json.dumps(obj).encode()
+
+METRICS = {
+    "acwi_quarter_return": 7.12,
+    "sp500_quarter_return": 7.47,
+    "quarter": "Q3 2025"
+}
+REPORT_PAYLOAD = dumps({"metrics": METRICS})
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Pre-encoded bodies go in requests' data= but httpx's (TestClient's) content=
+BODY_ARG = "content" if TEST_MODE == "inprocess" else "data"
+
+def post_json(s, url, body: bytes):
+    """POST an already-serialized JSON body"""
+    return s.post(url, headers=JSON_HEADERS, **{BODY_ARG: body})
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter applying TIMEOUT to requests that don't set their own"""
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = TIMEOUT
+        return super().send(request, **kwargs)
+
+def make_client():
+    """
+    HTTP client for the configured test mode
+    
+    Both clients expose the same get/post/status_code/json API. In-process
+    mode skips sockets and HTTP framing by driving the ASGI app directly.
+    """
+    if TEST_MODE == "inprocess":
+        from fastapi.testclient import TestClient
+        from main import app
+        return TestClient(app)
+    
+    # One keep-alive connection reused by every request below
+    s = requests.Session()
+    s.mount("http://", TimeoutHTTPAdapter(pool_connections=1, pool_maxsize=4))
+    return s
+
+def timed(latencies, name, call):
+    """Run call(), recording its latency in ns under latencies[name]"""
+    t0 = time.perf_counter_ns()
+    try:
+        return call()
+    finally:
+        latencies[name].append(time.perf_counter_ns() - t0)
+
+def test_all_endpoints(n_iters=1, warmup=0):
+    """
+    Smoke test the API, optionally as a latency benchmark
     
-    print("🧪 Testing AI Quarterly Reports API")
+    Args:
+        n_iters: Measured passes over the endpoints
+        warmup: Extra passes run first and left out of the timings
+    """
+    s = make_client()
+    latencies = defaultdict(list)
+    
+    print(f"🧪 Testing AI Quarterly Reports API ({TEST_MODE})")
     print("=" * 50)
     
+    for i in range(warmup + n_iters):
+        # Only the first pass prints results; warmup timings are discarded
+        sink = latencies if i >= warmup else defaultdict(list)
+        if not run_endpoints(s, sink, verbose=(i == 0)):
+            return
+    
+    print_latencies(latencies)
+
+def run_endpoints(s, latencies, verbose=True):
+    """One pass over the endpoints; False if a failure stops the run"""
+    log = print if verbose else (lambda *args: None)
+    
     # Test 1: Health check
     try:
-        response = requests.get(f"{base_url}/health")
-        print(f"✅ Health check: {response.status_code}")
+        response = timed(latencies, "health", lambda: s.get(HEALTH_URL))
+        log(f"✅ Health check: {response.status_code}")
         if response.status_code == 200:
-            print(f"   Response: {response.json()}")
+            log(f"   Response: {response.json()}")
     except Exception as e:
         print(f"❌ Health check failed: {e}")
-        return
+        return False
     
     # Test 2: Generate report
     try:
-        metrics = {
-            "acwi_quarter_return": 7.12,
-            "sp500_quarter_return": 7.47,
-            "quarter": "Q3 2025"
-        }
-        response = requests.post(f"{base_url}/report-ai", json={"metrics": metrics})
-        print(f"✅ Report generation: {response.status_code}")
+        response = timed(latencies, "report-ai", lambda: post_json(s, REPORT_URL, REPORT_PAYLOAD))
+        log(f"✅ Report generation: {response.status_code}")
         if response.status_code == 200:
             report_data = response.json()
             report = report_data["report"]
-            print(f"   Generated report: {report[:100]}...")
+            log(f"   Generated report: {report[:100]}...")
         else:
             print(f"   Error: {response.text}")
-            return
+            return False
     except Exception as e:
         print(f"❌ Report generation failed: {e}")
-        return
+        return False
+    
+    # Tests 3 and 4 only need the report, so they run concurrently
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [
+            executor.submit(check_validation, s, report, latencies),
+            executor.submit(check_style_score, s, report, latencies)
+        ]
+        for future in as_completed(futures):
+            log("\n".join(future.result()))
     
-    # Test 3: Validate report
+    return True
+
+def check_validation(s, report, latencies):
+    """Test 3: Validate report; returns the lines to print"""
     try:
-        response = requests.post(f"{base_url}/validate-ai", json={
+        body = dumps({
             "report": report,
-            "metrics": metrics
+            "metrics": METRICS
         })
-        print(f"✅ Report validation: {response.status_code}")
+        response = timed(latencies, "validate-ai", lambda: post_json(s, VALIDATE_URL, body))
+        lines = [f"✅ Report validation: {response.status_code}"]
         if response.status_code == 200:
             validation = response.json()
-            print(f"   Valid: {validation['valid']}, Errors: {len(validation['errors'])}")
+            lines.append(f"   Valid: {validation['valid']}, Errors: {len(validation['errors'])}")
         else:
-            print(f"   Error: {response.text}")
+            lines.append(f"   Error: {response.text}")
+        return lines
     except Exception as e:
-        print(f"❌ Report validation failed: {e}")
-    
-    # Test 4: Style scoring
+        return [f"❌ Report validation failed: {e}"]
+
+def check_style_score(s, report, latencies):
+    """Test 4: Style scoring; returns the lines to print"""
     try:
-        response = requests.post(f"{base_url}/style-score-ai", json={"report": report})
-        print(f"✅ Style scoring: {response.status_code}")
+        body = dumps({"report": report})
+        response = timed(latencies, "style-score-ai", lambda: post_json(s, STYLE_URL, body))
+        lines = [f"✅ Style scoring: {response.status_code}"]
         if response.status_code == 200:
             style = response.json()
-            print(f"   Style score: {style['style_score']}/{style['max_score']} - {style['feedback']}")
+            lines.append(f"   Style score: {style['style_score']}/{style['max_score']} - {style['feedback']}")
         else:
-            print(f"   Error: {response.text}")
+            lines.append(f"   Error: {response.text}")
+        return lines
     except Exception as e:
-        print(f"❌ Style scoring failed: {e}")
+        return [f"❌ Style scoring failed: {e}"]
+
+def print_latencies(latencies):
+    """Print min/median/p95 latency (ms) per endpoint"""
+    print("\n⏱️  Latency (ms)")
+    print(f"{'endpoint':<16}{'n':>4}{'min':>10}{'median':>10}{'p95':>10}")
+    for name, samples in latencies.items():
+        ms = [ns / 1e6 for ns in samples]
+        # quantiles needs two samples; with fewer, p95 is the only sample
+        p95 = statistics.quantiles(ms, n=20, method='inclusive')[18] if len(ms) > 1 else ms[0]
+        print(f"{name:<16}{len(ms):>4}{min(ms):>10.1f}{statistics.median(ms):>10.1f}{p95:>10.1f}")
 
 if __name__ == "__main__":
-    test_all_endpoints()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Smoke test / benchmark the API endpoints")
+    parser.add_argument("--iters", type=int, default=1, help="measured passes (e.g. 10 for a benchmark)")
+    parser.add_argument("--warmup", type=int, default=0, help="discarded warmup passes (e.g. 3)")
+    args = parser.parse_args()
+    test_all_endpoints(n_iters=args.iters, warmup=args.warmup)
@@ -135,9 +135,13 @@ export default function ValidationCard({ validation, loading }) {
               >
                 <div className="flex items-center justify-between mb-2">
                   <h4 className="font-medium text-gray-200">Semantic Validation</h4>
-                  <Badge variant={validation.semantic_valid ? "default" : "destructive"}>
-                    {validation.semantic_valid ? "PASS" : "FAIL"}
-                  </Badge>
+                  {validation.semantic_valid === null ? (
+                    <Badge variant="secondary">SKIPPED</Badge>
+                  ) : (
+                    <Badge variant={validation.semantic_valid ? "default" : "destructive"}>
+                      {validation.semantic_valid ? "PASS" : "FAIL"}
+                    </Badge>
+                  )}
                 </div>
                 <p className="text-sm text-gray-400">
                   AI checks for fabricated facts or inconsistencies